@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+from __future__ import unicode_literals
+import json
+import frappe
+from six import string_types
+from frappe import _
+from frappe.utils import flt, cint
+
+DEFAULT_VOLUMETRIC_DIVISOR = 5000
+DEFAULT_MAX_PARCEL_WEIGHT = 31.5
+# weights are packed in kg, items in another weight UOM are converted through the UOM Conversion Factors
+WEIGHT_UOM = 'Kg'
+# share of a box volume that can actually be filled with items
+BOX_FILL_FACTOR = 0.85
+
+
+def get_volumetric_weight(length, width, height, divisor=DEFAULT_VOLUMETRIC_DIVISOR):
+	# Dimensions in cm, weight in kg
+	return flt(length) * flt(width) * flt(height) / (cint(divisor) or DEFAULT_VOLUMETRIC_DIVISOR)
+
+
+def get_chargeable_weight(parcel, divisor=DEFAULT_VOLUMETRIC_DIVISOR):
+	volumetric_weight = get_volumetric_weight(parcel.get('length'), parcel.get('width'), parcel.get('height'), divisor)
+	return max(flt(parcel.get('weight')), volumetric_weight)
+
+
+def get_volumetric_divisor(parcel_service=None):
+	if parcel_service:
+		return cint(frappe.db.get_value('Parcel Service', parcel_service, 'volumetric_divisor')) \
+			or DEFAULT_VOLUMETRIC_DIVISOR
+	return DEFAULT_VOLUMETRIC_DIVISOR
+
+
+@frappe.whitelist()
+def get_proposed_parcels(delivery_notes, parcel_service=None, max_parcel_weight=None):
+	"""Returns Shipment Parcel rows packing the items of the Delivery Notes.
+
+	Items are packed first-fit decreasing by volume into the largest Shipment Parcel
+	Template, then every box is shrunk to the template with the lowest chargeable weight
+	that still holds its items. Without a `parcel_service` the one preselected on the
+	Delivery Notes sets the volumetric divisor."""
+	if isinstance(delivery_notes, string_types):
+		delivery_notes = json.loads(delivery_notes)
+	if not delivery_notes:
+		frappe.throw(_('Please add the Delivery Notes to ship first'))
+	for delivery_note in delivery_notes:
+		frappe.has_permission('Delivery Note', 'read', delivery_note, throw=True)
+
+	templates = get_box_templates()
+	if not templates:
+		frappe.throw(_('Please create a Shipment Parcel Template to propose parcels'))
+
+	divisor = get_volumetric_divisor(parcel_service or get_delivery_note_parcel_service(delivery_notes))
+	max_parcel_weight = flt(max_parcel_weight) or DEFAULT_MAX_PARCEL_WEIGHT
+	boxes = pack_items(get_item_units(delivery_notes), templates[-1], max_parcel_weight)
+
+	parcels = {}
+	for box in boxes:
+		template = get_smallest_template(box, templates, divisor)
+		key = (template.name, flt(box.weight, 3))
+		if key not in parcels:
+			parcels[key] = frappe._dict({
+				'parcel_template': template.name,
+				'length': template.length,
+				'width': template.width,
+				'height': template.height,
+				'weight': flt(box.weight, 3),
+				'count': 0,
+			})
+		parcels[key].count += 1
+	return list(parcels.values())
+
+
+def get_delivery_note_parcel_service(delivery_notes):
+	# Only a Parcel Service shared by all Delivery Notes decides the divisor
+	parcel_services = {d.parcel_service for d in frappe.get_all('Delivery Note',
+		filters={'name': ('in', delivery_notes)}, fields=['parcel_service'])}
+	return parcel_services.pop() if len(parcel_services) == 1 else None
+
+
+def get_box_templates():
+	templates = frappe.get_all('Shipment Parcel Template', fields=['name', 'length', 'width', 'height'])
+	for template in templates:
+		template.dimensions = sorted([flt(template.length), flt(template.width), flt(template.height)])
+		template.volume = template.dimensions[0] * template.dimensions[1] * template.dimensions[2]
+	return sorted(templates, key=lambda d: d.volume)
+
+
+def get_item_units(delivery_notes):
+	# Return one entry per unit shipped, largest first
+	items = frappe.db.sql("""
+		select dni.item_code, sum(dni.stock_qty) as qty, item.weight_per_unit, item.weight_uom,
+			item.shipping_length, item.shipping_width, item.shipping_height
+		from `tabDelivery Note Item` dni
+		inner join `tabItem` item on item.name = dni.item_code
+		where dni.parent in %(delivery_notes)s and item.is_stock_item = 1
+		group by dni.item_code
+	""", {'delivery_notes': tuple(delivery_notes)}, as_dict=1)
+
+	# an item without dimensions would fit into any box
+	missing = [item.item_code for item in items
+		if not (flt(item.shipping_length) and flt(item.shipping_width) and flt(item.shipping_height))]
+	if missing:
+		frappe.throw(_('Please set the Shipping Dimensions of Items {0}').format(', '.join(frappe.bold(d) for d in missing)),
+			title=_('Missing Shipping Dimensions'))
+
+	units, weight_factors = [], {}
+	for item in items:
+		weight_uom = item.weight_uom or WEIGHT_UOM
+		if weight_uom not in weight_factors:
+			weight_factors[weight_uom] = get_weight_factor(weight_uom)
+
+		dimensions = sorted([flt(item.shipping_length), flt(item.shipping_width), flt(item.shipping_height)])
+		unit = frappe._dict({
+			'item_code': item.item_code,
+			'dimensions': dimensions,
+			'volume': dimensions[0] * dimensions[1] * dimensions[2],
+			'weight': flt(item.weight_per_unit) * weight_factors[weight_uom],
+		})
+		qty = flt(item.qty)
+		units.extend([unit] * int(qty))
+		fraction = flt(qty - int(qty), 6)
+		if fraction:
+			# a fraction of a unit keeps its dimensions, but only its share of volume and weight
+			units.append(frappe._dict(unit, volume=unit.volume * fraction, weight=unit.weight * fraction))
+	return sorted(units, key=lambda d: (d.volume, d.weight), reverse=True)
+
+
+def get_weight_factor(weight_uom):
+	# Factor converting a weight in `weight_uom` to kg
+	if weight_uom == WEIGHT_UOM:
+		return 1
+	factor = frappe.db.get_value('UOM Conversion Factor', {'from_uom': weight_uom, 'to_uom': WEIGHT_UOM}, 'value')
+	if flt(factor):
+		return flt(factor)
+	factor = frappe.db.get_value('UOM Conversion Factor', {'from_uom': WEIGHT_UOM, 'to_uom': weight_uom}, 'value')
+	if flt(factor):
+		return 1 / flt(factor)
+	frappe.throw(_('Please add a UOM Conversion Factor from {0} to {1}').format(frappe.bold(weight_uom), WEIGHT_UOM),
+		title=_('Missing UOM Conversion'))
+
+
+def fits(unit, dimensions):
+	return all(a <= b for a, b in zip(unit.dimensions, dimensions))
+
+
+def pack_items(units, largest_template, max_parcel_weight):
+	capacity = largest_template.volume * BOX_FILL_FACTOR
+	boxes = []
+	for unit in units:
+		if not fits(unit, largest_template.dimensions) or unit.weight > max_parcel_weight:
+			frappe.throw(_('Item {0} does not fit into any Shipment Parcel Template').format(frappe.bold(unit.item_code)))
+
+		for box in boxes:
+			if box.volume + unit.volume <= capacity and box.weight + unit.weight <= max_parcel_weight:
+				break
+		else:
+			box = frappe._dict({'units': [], 'volume': 0, 'weight': 0})
+			boxes.append(box)
+
+		box.units.append(unit)
+		box.volume += unit.volume
+		box.weight += unit.weight
+	return boxes
+
+
+def get_smallest_template(box, templates, divisor):
+	candidates = [template for template in templates
+		if template.volume * BOX_FILL_FACTOR >= box.volume
+		and all(fits(unit, template.dimensions) for unit in box.units)]
+	return min(candidates, key=lambda template: (
+		max(box.weight, template.volume / divisor), template.volume))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Asyncio HTTP clients for the shipping providers.
+
+Provider clients subclass `AsyncProviderClient` and expose one coroutine per
+API call. Synchronous code runs them through `run_sync`; background jobs can
+share a single session and event loop for many calls:
+
+	async def fetch(client, ids):
+		async with client:
+			return await gather_limited([client.get_tracking_data(id) for id in ids])
+
+	run_sync(fetch(client, ids))
+"""
+from __future__ import unicode_literals
+import json
+import asyncio
+import aiohttp
+from time import perf_counter
+from erpnext_shipping.erpnext_shipping.profiler import record_http_time
+
+DEFAULT_TIMEOUT = 60
+DEFAULT_CONCURRENCY = 50
+
+
+class ProviderResponse():
+	def __init__(self, status, text):
+		self.status = status
+		self.text = text
+
+	def json(self):
+		return json.loads(self.text)
+
+
+class AsyncProviderClient():
+	provider = None
+	base_url = ''
+	headers = {}
+
+	def __init__(self, auth=None, headers=None):
+		# auth is a (login, password) tuple for basic authentication, unset until both are configured
+		self.auth = aiohttp.BasicAuth(*auth) if auth and all(auth) else None
+		self.headers = dict(self.headers, **(headers or {}))
+		self.session = None
+
+	async def __aenter__(self):
+		self.session = aiohttp.ClientSession(
+			auth=self.auth,
+			headers=self.headers,
+			timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+		)
+		return self
+
+	async def __aexit__(self, *args):
+		await self.session.close()
+		self.session = None
+
+	async def request(self, method, path, **kwargs):
+		"""Returns the ProviderResponse for a request to `base_url` + `path`."""
+		if self.session is None:
+			# no shared session, open one for this request only
+			async with self:
+				return await self.request(method, path, **kwargs)
+
+		start = perf_counter()
+		try:
+			async with self.session.request(method, self.base_url + path, **kwargs) as response:
+				return ProviderResponse(response.status, await response.text())
+		finally:
+			record_http_time(self.provider, perf_counter() - start)
+
+	async def download(self, url, **kwargs):
+		"""Returns the body of a GET request to an absolute URL as bytes, e.g. a label document."""
+		if self.session is None:
+			async with self:
+				return await self.download(url, **kwargs)
+
+		start = perf_counter()
+		try:
+			async with self.session.get(url, **kwargs) as response:
+				response.raise_for_status()
+				return await response.read()
+		finally:
+			record_http_time(self.provider, perf_counter() - start)
+
+	async def get_json(self, path, **kwargs):
+		return (await self.request('GET', path, **kwargs)).json()
+
+	async def post_json(self, path, **kwargs):
+		return (await self.request('POST', path, **kwargs)).json()
+
+
+async def gather_limited(coroutines, limit=DEFAULT_CONCURRENCY):
+	"""Await the coroutines with at most `limit` in flight.
+
+	Exceptions are returned in place of results, like `asyncio.gather(return_exceptions=True)`."""
+	semaphore = asyncio.Semaphore(limit)
+
+	async def run(coroutine):
+		async with semaphore:
+			return await coroutine
+
+	return await asyncio.gather(*[run(coroutine) for coroutine in coroutines], return_exceptions=True)
+
+
+def run_sync(coroutine):
+	# Synchronous facade used by the whitelisted methods and the provider utils
+	return asyncio.run(coroutine)
@@ -3,7 +3,6 @@
 # For license information, please see license.txt
 
 from __future__ import unicode_literals
-import requests
 import frappe
 import json
 import re
@@ -11,11 +10,39 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils.password import get_decrypted_password
 from erpnext_shipping.erpnext_shipping.utils import show_error_alert
-
-LETMESHIP_PROVIDER = 'LetMeShip'
+from erpnext_shipping.erpnext_shipping.client import AsyncProviderClient, gather_limited, run_sync
+from erpnext_shipping.erpnext_shipping.providers import LETMESHIP_PROVIDER, ShippingProviderError
 
 class LetMeShip(Document): pass
 
+class LetMeShipClient(AsyncProviderClient):
+	provider = LETMESHIP_PROVIDER
+	base_url = 'https://api.letmeship.com/v1'
+	headers = {
+		'Content-Type': 'application/json',
+		'Accept': 'application/json',
+		'Access-Control-Allow-Origin': 'string'
+	}
+
+	async def get_available_services(self, payload):
+		return await self.post_json('/available', data=json.dumps(payload))
+
+	async def create_shipment(self, payload):
+		return await self.post_json('/shipments', data=json.dumps(payload))
+
+	async def get_shipment(self, shipment_id):
+		return await self.get_json('/shipments/{id}'.format(id=shipment_id))
+
+	async def get_label(self, shipment_id):
+		return await self.get_json('/shipments/{id}/documents?types=LABEL'.format(id=shipment_id))
+
+	async def get_tracking_data(self, shipment_id):
+		return await self.get_json('/tracking?shipmentid={id}'.format(id=shipment_id))
+
+	async def get_bulk_tracking_data(self, shipment_ids):
+		async with self:
+			return await gather_limited([self.get_tracking_data(shipment_id) for shipment_id in shipment_ids])
+
 class LetMeShipUtils():
 	def __init__(self):
 		self.api_password = get_decrypted_password('LetMeShip', 'LetMeShip', 'api_password', raise_exception=False)
@@ -25,6 +52,8 @@ class LetMeShipUtils():
 			link = frappe.utils.get_link_to_form('LetMeShip', 'LetMeShip', frappe.bold('LetMeShip Settings'))
 			frappe.throw(_('Please enable LetMeShip Integration in {0}'.format(link)), title=_('Mandatory'))
 
+		self.client = LetMeShipClient(auth=(self.api_id, self.api_password))
+
 	def get_available_services(self, delivery_to_type, pickup_address,
 		delivery_address, shipment_parcel, description_of_content, pickup_date,
 		value_of_goods, pickup_contact=None, delivery_contact=None):
@@ -37,12 +66,6 @@ class LetMeShipUtils():
 		delivery_address.address_title = self.trim_address(delivery_address)
 		parcel_list = self.get_parcel_list(json.loads(shipment_parcel), description_of_content)
 
-		url = 'https://api.letmeship.com/v1/available'
-		headers = {
-			'Content-Type': 'application/json',
-			'Accept': 'application/json',
-			'Access-Control-Allow-Origin': 'string'
-		}
 		payload = self.generate_payload(
 			pickup_address=pickup_address,
 			pickup_contact=pickup_contact,
@@ -55,13 +78,7 @@ class LetMeShipUtils():
 		)
 		try:
 			available_services = []
-			response_data = requests.post(
-				url=url,
-				auth=(self.api_id, self.api_password),
-				headers=headers,
-				data=json.dumps(payload)
-			)
-			response_data = json.loads(response_data.text)
+			response_data = run_sync(self.client.get_available_services(payload))
 			if 'serviceList' in response_data:
 				for response in response_data['serviceList']:
 					available_service = self.get_service_dict(response)
@@ -72,7 +89,7 @@ class LetMeShipUtils():
 				frappe.throw(_('An Error occurred while fetching LetMeShip prices: {0}')
 					.format(response_data['message']))
 		except Exception:
-			show_error_alert("fetching LetMeShip prices")
+			show_error_alert("fetching LetMeShip prices", LETMESHIP_PROVIDER)
 
 		return []
 
@@ -87,12 +104,6 @@ class LetMeShipUtils():
 		delivery_address.address_title = self.trim_address(delivery_address)
 		parcel_list = self.get_parcel_list(json.loads(shipment_parcel), description_of_content)
 
-		url = 'https://api.letmeship.com/v1/shipments'
-		headers = {
-			'Content-Type': 'application/json',
-			'Accept': 'application/json',
-			'Access-Control-Allow-Origin': 'string'
-		}
 		payload = self.generate_payload(
 			pickup_address=pickup_address,
 			pickup_contact=pickup_contact,
@@ -104,19 +115,11 @@ class LetMeShipUtils():
 			pickup_date=pickup_date,
 			service_info=service_info)
 		try:
-			response_data = requests.post(
-				url=url,
-				auth=(self.api_id, self.api_password),
-				headers=headers,
-				data=json.dumps(payload)
-			)
-			response_data = json.loads(response_data.text)
+			response_data = run_sync(self.client.create_shipment(payload))
 			if 'shipmentId' in response_data:
 				shipment_amount = response_data['service']['priceInfo']['totalPrice']
 				awb_number = ''
-				url = 'https://api.letmeship.com/v1/shipments/{id}'.format(id=response_data['shipmentId'])
-				tracking_response = requests.get(url, auth=(self.api_id, self.api_password),headers=headers)
-				tracking_response_data = json.loads(tracking_response.text)
+				tracking_response_data = run_sync(self.client.get_shipment(response_data['shipmentId']))
 				if 'trackingData' in tracking_response_data:
 					for parcel in tracking_response_data['trackingData']['parcelList']:
 						if 'awbNumber' in parcel:
@@ -133,23 +136,12 @@ class LetMeShipUtils():
 				frappe.throw(_('An Error occurred while creating Shipment: {0}')
 					.format(response_data['message']))
 		except Exception:
-			show_error_alert("creating LetMeShip Shipment")
+			show_error_alert("creating LetMeShip Shipment", LETMESHIP_PROVIDER)
 
 	def get_label(self, shipment_id):
 		# Retrieve shipment label from LetMeShip
 		try:
-			headers = {
-				'Content-Type': 'application/json',
-				'Accept': 'application/json',
-				'Access-Control-Allow-Origin': 'string'
-			}
-			url = 'https://api.letmeship.com/v1/shipments/{id}/documents?types=LABEL'.format(id=shipment_id)
-			shipment_label_response = requests.get(
-				url,
-				auth=(self.api_id, self.api_password),
-				headers=headers
-			)
-			shipment_label_response_data = json.loads(shipment_label_response.text)
+			shipment_label_response_data = run_sync(self.client.get_label(shipment_id))
 			if 'documents' in shipment_label_response_data:
 				for label in shipment_label_response_data['documents']:
 					if 'data' in label:
@@ -158,47 +150,56 @@ class LetMeShipUtils():
 				frappe.throw(_('Error occurred while printing Shipment: {0}')
 					.format(shipment_label_response_data['message']))
 		except Exception:
-			show_error_alert("printing LetMeShip Label")
+			show_error_alert("printing LetMeShip Label", LETMESHIP_PROVIDER)
 
 	def get_tracking_data(self, shipment_id):
-		from erpnext_shipping.erpnext_shipping.utils import get_tracking_url
 		# return letmeship tracking data
-		headers = {
-			'Content-Type': 'application/json',
-			'Accept': 'application/json',
-			'Access-Control-Allow-Origin': 'string'
-		}
 		try:
-			url = 'https://api.letmeship.com/v1/tracking?shipmentid={id}'.format(id=shipment_id)
-			tracking_data_response = requests.get(
-				url,
-				auth=(self.api_id, self.api_password),
-				headers=headers
-			)
-			tracking_data = json.loads(tracking_data_response.text)
-			if 'awbNumber' in tracking_data:
-				tracking_status = 'In Progress'
-				if tracking_data['lmsTrackingStatus'].startswith('DELIVERED'):
-					tracking_status = 'Delivered'
-				if tracking_data['lmsTrackingStatus'] == 'RETURNED':
-					tracking_status = 'Returned'
-				if tracking_data['lmsTrackingStatus'] == 'LOST':
-					tracking_status = 'Lost'
-				tracking_url = get_tracking_url(
-					carrier=tracking_data['carrier'],
-					tracking_number=tracking_data['awbNumber']
-				)
-				return {
-					'awb_number': tracking_data['awbNumber'],
-					'tracking_status': tracking_status,
-					'tracking_status_info': tracking_data['lmsTrackingStatus'],
-					'tracking_url': tracking_url,
-				}
-			elif 'message' in tracking_data:
-				frappe.throw(_('Error occurred while updating Shipment: {0}')
-					.format(tracking_data['message']))
+			tracking_data = run_sync(self.client.get_tracking_data(shipment_id))
+			return self.get_tracking_dict(tracking_data)
 		except Exception:
-			show_error_alert("updating LetMeShip Shipment")
+			show_error_alert("updating LetMeShip Shipment", LETMESHIP_PROVIDER)
+			raise ShippingProviderError(_('LetMeShip failed to return tracking data for {0}').format(shipment_id))
+
+	def get_bulk_tracking_data(self, shipment_ids, parcel_ids=None):
+		"""Returns the tracking data of many shipments, fetched concurrently, by shipment id.
+
+		Shipments whose request failed are left out."""
+		responses = run_sync(self.client.get_bulk_tracking_data(shipment_ids))
+		bulk_tracking_data = {}
+		for shipment_id, tracking_data in zip(shipment_ids, responses):
+			try:
+				if isinstance(tracking_data, Exception):
+					raise tracking_data
+				bulk_tracking_data[shipment_id] = self.get_tracking_dict(tracking_data)
+			except Exception:
+				show_error_alert("updating LetMeShip Shipment", LETMESHIP_PROVIDER)
+		return bulk_tracking_data
+
+	def get_tracking_dict(self, tracking_data):
+		from erpnext_shipping.erpnext_shipping.utils import get_tracking_url
+
+		if 'awbNumber' in tracking_data:
+			tracking_status = 'In Progress'
+			if tracking_data['lmsTrackingStatus'].startswith('DELIVERED'):
+				tracking_status = 'Delivered'
+			if tracking_data['lmsTrackingStatus'] == 'RETURNED':
+				tracking_status = 'Returned'
+			if tracking_data['lmsTrackingStatus'] == 'LOST':
+				tracking_status = 'Lost'
+			tracking_url = get_tracking_url(
+				carrier=tracking_data['carrier'],
+				tracking_number=tracking_data['awbNumber']
+			)
+			return {
+				'awb_number': tracking_data['awbNumber'],
+				'tracking_status': tracking_status,
+				'tracking_status_info': tracking_data['lmsTrackingStatus'],
+				'tracking_url': tracking_url,
+			}
+		elif 'message' in tracking_data:
+			frappe.throw(_('Error occurred while updating Shipment: {0}')
+				.format(tracking_data['message']))
 
 	def generate_payload(self, pickup_address, pickup_contact, delivery_address, delivery_contact,
 		description_of_content, value_of_goods, parcel_list, pickup_date, service_info=None):
@@ -255,8 +256,7 @@ class LetMeShipUtils():
 
 	def trim_address(self, address):
 		# LetMeShip has a limit of 30 characters for Company field
-		if len(address.address_title) > 30:
-			return address.address_title[:30]
+		return (address.address_title or '')[:30]
 
 	def get_service_dict(self, response):
 		"""Returns a dictionary with service info."""
@@ -275,19 +275,20 @@ class LetMeShipUtils():
 		return available_service
 
 	def set_letmeship_specific_fields(self, pickup_contact, delivery_contact):
-		pickup_contact.phone_prefix = pickup_contact.phone[:3]
-		pickup_contact.phone = re.sub('[^A-Za-z0-9]+', '', pickup_contact.phone[3:])
-
-		pickup_contact.title = 'MS'
-		if pickup_contact.gender == 'Male':
-			pickup_contact.title = 'MR'
+		for contact in (pickup_contact, delivery_contact):
+			contact.phone_prefix, contact.phone = self.split_phone_number(contact.phone)
 
-		delivery_contact.phone_prefix = delivery_contact.phone[:3]
-		delivery_contact.phone = re.sub('[^A-Za-z0-9]+', '', delivery_contact.phone[3:])
+			contact.title = 'MS'
+			if contact.gender == 'Male':
+				contact.title = 'MR'
 
-		delivery_contact.title = 'MS'
-		if delivery_contact.gender == 'Male':
-			delivery_contact.title = 'MR'
+	def split_phone_number(self, phone):
+		"""Returns the calling code prefix and the remaining digits of a phone number."""
+		phone = re.sub(r'^00', '+', phone.strip())
+		# a separator after the calling code tells its length, e.g. "+1 555 0100" or "+49-30-1234"
+		match = re.match(r'^(\+\d{1,3})[\s\-/(.]', phone)
+		prefix = match.group(1) if match else phone[:3]
+		return prefix, re.sub('[^A-Za-z0-9]+', '', phone[len(prefix):])
 
 	def get_parcel_list(self, shipment_parcel, description_of_content):
 		parcel_list = []
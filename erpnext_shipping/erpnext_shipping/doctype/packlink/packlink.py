@@ -4,17 +4,48 @@
 
 from __future__ import unicode_literals
 import json
+import math
 import frappe
-import requests
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils.password import get_decrypted_password
-from erpnext_shipping.erpnext_shipping.utils import show_error_alert
+from frappe.utils import flt, add_days, getdate
+from erpnext_shipping.erpnext_shipping.utils import show_error_alert, get_fingerprint
+from erpnext_shipping.erpnext_shipping.client import AsyncProviderClient, gather_limited, run_sync
+from erpnext_shipping.erpnext_shipping.providers import PACKLINK_PROVIDER, ShippingProviderError
 
-PACKLINK_PROVIDER = 'Packlink'
+PACKLINK_SERVICES_KEY = 'packlink_services'
+PACKLINK_SERVICES_EXPIRY = 15 * 60
+PICKUP_DATE_WINDOW = 7
 
 class Packlink(Document): pass
 
+class PackLinkClient(AsyncProviderClient):
+	provider = PACKLINK_PROVIDER
+	base_url = 'https://api.packlink.com/v1'
+
+	def __init__(self, api_key):
+		super(PackLinkClient, self).__init__(headers={
+			'Authorization': api_key,
+			'Content-Type': 'application/json'
+		})
+
+	async def get_available_services(self, path):
+		return await self.get_json(path)
+
+	async def create_shipment(self, data):
+		return await self.post_json('/shipments', json=data)
+
+	async def get_label(self, shipment_id):
+		return await self.get_json('/shipments/{id}/labels'.format(id=shipment_id))
+
+	async def get_tracking_data(self, shipment_id):
+		return await self.get_json('/shipments/{id}'.format(id=shipment_id))
+
+	async def get_bulk_tracking_data(self, shipment_ids):
+		async with self:
+			return await gather_limited([self.get_tracking_data(shipment_id) for shipment_id in shipment_ids])
+
 class PackLinkUtils():
 	def __init__(self):
 		self.api_key = get_decrypted_password('Packlink', 'Packlink', 'api_key', raise_exception=False)
@@ -24,44 +55,79 @@ class PackLinkUtils():
 			link = frappe.utils.get_link_to_form('Packlink', 'Packlink', frappe.bold('Packlink Settings'))
 			frappe.throw(_('Please enable Packlink Integration in {0}'.format(link)), title=_('Mandatory'))
 
+		self.client = PackLinkClient(self.api_key)
+
 	def get_available_services(self, pickup_address, delivery_address, shipment_parcel, pickup_date):
 		# Retrieve rates at PackLink from specification stated.
-		parcel_list = self.get_parcel_list(json.loads(shipment_parcel))
-		shipment_parcel_params = self.get_formatted_parcel_params(parcel_list)
-		url = self.get_formatted_request_url(pickup_address, delivery_address, shipment_parcel_params)
-
 		if not self.api_key or not self.enabled:
 			return []
 
 		try:
-			responses = requests.get(url, headers={'Authorization': self.api_key})
-			responses_dict = json.loads(responses.text)
-			# If an error occured on the api. Show the error message
-			if 'messages' in responses_dict:
-				error_message = str(responses_dict['messages'][0]['message'])
-				frappe.throw(error_message, title=_("PackLink"))
-
-			available_services = []
-			for response in responses_dict:
-				# display services only if available on pickup date
-				if self.parse_pickup_date(pickup_date) in response['available_dates'].keys():
-					available_service = self.get_service_dict(response)
-					available_services.append(available_service)
-
+			responses_dict = self.get_service_responses(pickup_address, delivery_address, shipment_parcel)
+			# display services only if available on pickup date
+			available_services = self.get_services_for_date(responses_dict, pickup_date)
 			if responses_dict and not available_services:
 				# got a response but no service available for given date
 				frappe.throw(_("No Services available for {0}").format(pickup_date), title=_("PackLink"))
 
 			return available_services
 		except Exception:
-			show_error_alert("fetching Packlink prices")
+			show_error_alert("fetching Packlink prices", PACKLINK_PROVIDER)
 
 		return []
 
+	def get_services_by_date(self, pickup_address, delivery_address, shipment_parcel, from_date, days=PICKUP_DATE_WINDOW):
+		"""Returns the available services per pickup date for `days` days from `from_date`, from a single request."""
+		if not self.api_key or not self.enabled:
+			return {}
+
+		try:
+			responses_dict = self.get_service_responses(pickup_address, delivery_address, shipment_parcel)
+			services_by_date = {}
+			for day in range(days):
+				pickup_date = str(add_days(getdate(from_date), day))
+				available_services = self.get_services_for_date(responses_dict, pickup_date)
+				if available_services:
+					services_by_date[pickup_date] = available_services
+			return services_by_date
+		except Exception:
+			show_error_alert("fetching Packlink prices", PACKLINK_PROVIDER)
+
+		return {}
+
+	def get_service_responses(self, pickup_address, delivery_address, shipment_parcel):
+		# Every service comes with all of its available dates, so one response per
+		# route and parcels serves the quotes for any pickup date
+		parcel_list = self.get_parcel_list(json.loads(shipment_parcel))
+		shipment_parcel_params = self.get_formatted_parcel_params(parcel_list)
+		url = self.get_formatted_request_url(pickup_address, delivery_address, shipment_parcel_params)
+
+		cache_key = '{0}:{1}'.format(PACKLINK_SERVICES_KEY, get_fingerprint(url))
+		responses_dict = frappe.cache().get_value(cache_key, expires=True)
+		if responses_dict is None:
+			responses_dict = run_sync(self.client.get_available_services(url))
+			# If an error occured on the api. Show the error message
+			if 'messages' in responses_dict:
+				error_message = str(responses_dict['messages'][0]['message'])
+				frappe.throw(error_message, title=_("PackLink"))
+			frappe.cache().set_value(cache_key, responses_dict, expires_in_sec=PACKLINK_SERVICES_EXPIRY)
+		return responses_dict
+
+	def get_services_for_date(self, responses_dict, pickup_date):
+		available_services = []
+		for response in responses_dict:
+			if self.parse_pickup_date(pickup_date) in response['available_dates'].keys():
+				available_service = self.get_service_dict(response)
+				available_service.pickup_date = pickup_date
+				available_services.append(available_service)
+		return available_services
+
 	def create_shipment(self, pickup_address, delivery_address, shipment_parcel,
 		description_of_content, pickup_date, value_of_goods, pickup_contact,
 		delivery_contact, service_info):
 		# Create a transaction at PackLink
+		# the collection date picked in the dialog comes with the quote of that date
+		collection_date = service_info.get('pickup_date') or pickup_date
 		data = {
 			'additional_data': {
 				'postal_zone_id_from': '',
@@ -69,7 +135,7 @@ class PackLinkUtils():
 				'postal_zone_id_to': '',
 				'postal_zone_name_to': delivery_address.country,
 			},
-			'collection_date': self.parse_pickup_date(pickup_date),
+			'collection_date': self.parse_pickup_date(collection_date),
 			'collection_time': '',
 			'content': description_of_content,
 			'contentvalue': value_of_goods,
@@ -82,14 +148,8 @@ class PackLinkUtils():
 			'to': self.get_shipment_address_contact_dict(delivery_address, delivery_contact)
 		}
 
-		url = 'https://api.packlink.com/v1/shipments'
-		headers = {
-			'Authorization': self.api_key,
-			'Content-Type': 'application/json'
-		}
 		try:
-			response_data = requests.post(url, json=data, headers=headers)
-			response_data = json.loads(response_data.text)
+			response_data = run_sync(self.client.create_shipment(data))
 			if 'reference' in response_data:
 				return {
 					'service_provider': PACKLINK_PROVIDER,
@@ -98,22 +158,15 @@ class PackLinkUtils():
 					'carrier_service': service_info['service_name'],
 					'shipment_amount': service_info['actual_price'],
 					'awb_number': '',
+					'pickup_date': collection_date,
 				}
 		except Exception:
-			show_error_alert("creating Packlink Shipment")
+			show_error_alert("creating Packlink Shipment", PACKLINK_PROVIDER)
 
 	def get_label(self, shipment_id):
 		# Retrieve shipment label from PackLink
-		headers = {
-			'Authorization': self.api_key,
-			'Content-Type': 'application/json'
-		}
 		try:
-			shipment_label_response = requests.get(
-				'https://api.packlink.com/v1/shipments/{id}/labels'.format(id=shipment_id),
-				headers=headers
-			)
-			shipment_label = json.loads(shipment_label_response.text)
+			shipment_label = run_sync(self.client.get_label(shipment_id))
 			if shipment_label:
 				return shipment_label
 			else:
@@ -121,47 +174,59 @@ class PackLinkUtils():
 					.format(shipment_id)
 				frappe.msgprint(msg=_(message), title=_("Label Not Found"))
 		except Exception:
-			show_error_alert("printing Packlink Label")
+			show_error_alert("printing Packlink Label", PACKLINK_PROVIDER)
 		return []
 
 	def get_tracking_data(self, shipment_id):
 		# Get Packlink Tracking Info
-		from erpnext_shipping.erpnext_shipping.utils import get_tracking_url
-
-		headers = {
-			'Authorization': self.api_key,
-			'Content-Type': 'application/json'
-		}
 		try:
-			url = 'https://api.packlink.com/v1/shipments/{id}'.format(id=shipment_id)
-			tracking_data_response = requests.get(url, headers=headers)
-			tracking_data = json.loads(tracking_data_response.text)
-			if 'trackings' in tracking_data:
-				tracking_status = 'In Progress'
-				if tracking_data['state'] == 'DELIVERED':
-					tracking_status = 'Delivered'
-				if tracking_data['state'] == 'RETURNED':
-					tracking_status = 'Returned'
-				if tracking_data['state'] == 'LOST':
-					tracking_status = 'Lost'
-				awb_number = None if not tracking_data['trackings'] else tracking_data['trackings'][0]
-				tracking_url = get_tracking_url(
-					carrier=tracking_data['carrier'],
-					tracking_number=awb_number
-				)
-				return {
-					'awb_number': awb_number,
-					'tracking_status': tracking_status,
-					'tracking_status_info': tracking_data['state'],
-					'tracking_url': tracking_url
-				}
+			tracking_data = run_sync(self.client.get_tracking_data(shipment_id))
+			return self.get_tracking_dict(tracking_data)
 		except Exception:
-			show_error_alert("updating Packlink Shipment")
-		return []
+			show_error_alert("updating Packlink Shipment", PACKLINK_PROVIDER)
+			raise ShippingProviderError(_('Packlink failed to return tracking data for {0}').format(shipment_id))
+
+	def get_bulk_tracking_data(self, shipment_ids, parcel_ids=None):
+		"""Returns the tracking data of many shipments, fetched concurrently, by shipment id.
+
+		Shipments whose request failed are left out."""
+		responses = run_sync(self.client.get_bulk_tracking_data(shipment_ids))
+		bulk_tracking_data = {}
+		for shipment_id, tracking_data in zip(shipment_ids, responses):
+			try:
+				if isinstance(tracking_data, Exception):
+					raise tracking_data
+				bulk_tracking_data[shipment_id] = self.get_tracking_dict(tracking_data)
+			except Exception:
+				show_error_alert("updating Packlink Shipment", PACKLINK_PROVIDER)
+		return bulk_tracking_data
+
+	def get_tracking_dict(self, tracking_data):
+		from erpnext_shipping.erpnext_shipping.utils import get_tracking_url
+
+		if 'trackings' in tracking_data:
+			tracking_status = 'In Progress'
+			if tracking_data['state'] == 'DELIVERED':
+				tracking_status = 'Delivered'
+			if tracking_data['state'] == 'RETURNED':
+				tracking_status = 'Returned'
+			if tracking_data['state'] == 'LOST':
+				tracking_status = 'Lost'
+			awb_number = None if not tracking_data['trackings'] else tracking_data['trackings'][0]
+			tracking_url = get_tracking_url(
+				carrier=tracking_data['carrier'],
+				tracking_number=awb_number
+			)
+			return {
+				'awb_number': awb_number,
+				'tracking_status': tracking_status,
+				'tracking_status_info': tracking_data['state'],
+				'tracking_url': tracking_url
+			}
 
 	def get_formatted_request_url(self, pickup_address, delivery_address, shipment_parcel_params):
 		"""Returns formatted request URL for Packlink."""
-		url = 'https://api.packlink.com/v1/services?from[country]={from_country_code}&from[zip]={from_zip}&to[country]={to_country_code}&to[zip]={to_zip}&{shipment_parcel_params}sortBy=totalPrice&source=PRO'.format(
+		url = '/services?from[country]={from_country_code}&from[zip]={from_zip}&to[country]={to_country_code}&to[zip]={to_zip}&{shipment_parcel_params}sortBy=totalPrice&source=PRO'.format(
 			from_country_code=pickup_address.country_code,
 			from_zip=pickup_address.pincode,
 			to_country_code=delivery_address.country_code,
@@ -195,6 +260,8 @@ class PackLinkUtils():
 		available_service.actual_price = response['price']['total_price']
 		available_service.service_id = response['id']
 		available_service.available_dates = response['available_dates']
+		if response.get('transit_hours'):
+			available_service.transit_days = int(math.ceil(flt(response['transit_hours']) / 24))
 		return available_service
 
 	def get_shipment_address_contact_dict(self, address, contact):
@@ -5,6 +5,15 @@
 from __future__ import unicode_literals
 import frappe
 from frappe.model.document import Document
+from erpnext_shipping.erpnext_shipping.utils import clear_tracking_url_cache
 
 class ParcelService(Document):
-	pass
+	def on_update(self):
+		clear_tracking_url_cache(self.name)
+
+	def on_trash(self):
+		clear_tracking_url_cache(self.name)
+
+	def after_rename(self, old_name, new_name, merge=False):
+		clear_tracking_url_cache(old_name)
+		clear_tracking_url_cache(new_name)
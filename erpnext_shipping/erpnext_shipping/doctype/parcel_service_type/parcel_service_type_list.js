@@ -0,0 +1,39 @@
+frappe.listview_settings['Parcel Service Type'] = {
+	onload: function(listview) {
+		listview.page.add_menu_item(__('Import Service Catalogue'), function() {
+			const dialog = new frappe.ui.Dialog({
+				title: __('Import Service Catalogue'),
+				fields: [
+					{
+						fieldname: 'file_url',
+						fieldtype: 'Attach',
+						label: __('CSV File'),
+						description: __('Columns: Parcel Service, Parcel Service Type, Alias, Description, Show in Preferred Services List. Separate several aliases with semicolons.')
+					},
+					{
+						fieldname: 'service_provider',
+						fieldtype: 'Select',
+						label: __('Or Import from Provider'),
+						options: ['', 'SendCloud'],
+						depends_on: 'eval:!doc.file_url'
+					}
+				],
+				primary_action_label: __('Import'),
+				primary_action: function(values) {
+					frappe.xcall('erpnext_shipping.erpnext_shipping.service_catalogue.import_service_catalogue', values)
+						.then((result) => {
+							dialog.hide();
+							frappe.msgprint(__('Created {0} Parcel Services, {1} Parcel Service Types and {2} aliases, updated {3} Parcel Service Types.',
+								[result.parcel_services, result.parcel_service_types, result.aliases, result.updated]));
+							listview.refresh();
+						});
+				}
+			});
+			dialog.show();
+		});
+
+		listview.page.add_menu_item(__('Unmatched Service Names'), function() {
+			frappe.set_route('query-report', 'Unmatched Service Names');
+		});
+	}
+};
@@ -3,21 +3,73 @@
 # For license information, please see license.txt
 
 from __future__ import unicode_literals
-import requests
 import frappe
 import json
 from frappe import _
-from frappe.utils import flt
+import pytz
+from frappe.utils import flt, cint, add_days, add_to_date, now_datetime, get_datetime, get_time_zone
 from frappe.utils.data import get_link_to_form
 from frappe.model.document import Document
 from erpnext_shipping.erpnext_shipping.utils import show_error_alert
+from erpnext_shipping.erpnext_shipping.client import AsyncProviderClient, gather_limited, run_sync
+from erpnext_shipping.erpnext_shipping.providers import SENDCLOUD_PROVIDER, ShippingProviderError
 
-SENDCLOUD_PROVIDER = 'SendCloud'
+# the first delta sync starts this many days back
+INITIAL_SYNC_DAYS = 30
+# parcels updated while the previous sync ran are fetched again
+SYNC_OVERLAP_MINUTES = 5
 
 class SendCloud(Document):
 	pass
 
 
+class SendCloudClient(AsyncProviderClient):
+	provider = SENDCLOUD_PROVIDER
+	base_url = 'https://panel.sendcloud.sc/api/v2'
+
+	async def get_shipping_methods(self):
+		return await self.get_json('/shipping_methods')
+
+	async def create_parcels(self, parcels):
+		return await self.post_json('/parcels?errors=verbose', json={'parcels': parcels})
+
+	async def get_label(self, parcel_id):
+		return await self.get_json('/labels/{id}'.format(id=parcel_id))
+
+	async def get_label_document(self, parcel_id, dpi):
+		# ZPL where the carrier supports it, the PDF label otherwise
+		path = '/parcels/{id}/documents/label'.format(id=parcel_id)
+		response = await self.request('GET', path, params={'dpi': dpi}, headers={'Accept': 'application/zpl'})
+		if response.status == 200:
+			return 'zpl', response.text
+		return 'pdf', await self.download(self.base_url + path, headers={'Accept': 'application/pdf'})
+
+	async def get_label_documents(self, parcel_ids, dpi):
+		async with self:
+			return await gather_limited([self.get_label_document(parcel_id, dpi) for parcel_id in parcel_ids])
+
+	async def get_parcel(self, parcel_id):
+		return await self.get_json('/parcels/{id}'.format(id=parcel_id))
+
+	async def iter_updated_parcels(self, updated_after):
+		"""Yields the pages of parcels updated after the given ISO 8601 timestamp."""
+		path, params = '/parcels', {'updated_after': updated_after}
+		async with self:
+			while path:
+				page = await self.get_json(path, params=params)
+				yield page.get('parcels') or []
+				# the next page is a full URL including the cursor
+				path, params = (page.get('next') or '').replace(self.base_url, '', 1), None
+
+	async def get_labels(self, parcel_ids):
+		async with self:
+			return await gather_limited([self.get_label(parcel_id) for parcel_id in parcel_ids])
+
+	async def get_parcels(self, parcel_ids):
+		async with self:
+			return await gather_limited([self.get_parcel(parcel_id) for parcel_id in parcel_ids])
+
+
 class SendCloudUtils():
 	def __init__(self):
 		settings = frappe.get_single("SendCloud")
@@ -29,17 +81,15 @@ class SendCloudUtils():
 			link = get_link_to_form("SendCloud", "SendCloud", _("SendCloud Settings"))
 			frappe.throw(_("Please enable SendCloud Integration in {0}").format(link))
 
+		self.client = SendCloudClient(auth=(self.api_key, self.api_secret))
+
 	def get_available_services(self, delivery_address, shipment_parcel):
 		# Retrieve rates at SendCloud from specification stated.
 		if not self.enabled or not self.api_key or not self.api_secret:
 			return []
 
 		try:
-			response = requests.get(
-				"https://panel.sendcloud.sc/api/v2/shipping_methods",
-				auth=(self.api_key, self.api_secret)
-			)
-			responses_dict = response.json()
+			responses_dict = run_sync(self.client.get_shipping_methods())
 
 			if "error" in responses_dict:
 				error_message = responses_dict["error"]["message"]
@@ -55,7 +105,19 @@ class SendCloudUtils():
 
 			return available_services
 		except Exception:
-			show_error_alert("fetching SendCloud prices")
+			show_error_alert("fetching SendCloud prices", SENDCLOUD_PROVIDER)
+
+	def get_service_catalogue(self):
+		# Rows for the Parcel Service Type importer, one per shipping method
+		responses_dict = run_sync(self.client.get_shipping_methods())
+		if "error" in responses_dict:
+			frappe.throw(responses_dict["error"]["message"], title=_("SendCloud"))
+
+		return [{
+			'parcel_service': self.get_carrier(service['carrier'], post_or_get="get"),
+			'parcel_service_type': service['name'],
+			'alias': service['name'],
+		} for service in responses_dict.get("shipping_methods", [])]
 
 	def create_shipment(self, shipment, delivery_address, delivery_contact, service_info, shipment_parcel,
 		description_of_content, value_of_goods):
@@ -70,40 +132,38 @@ class SendCloudUtils():
 			parcels.append(parcel_data)
 
 		try:
-			response = requests.post(
-				"https://panel.sendcloud.sc/api/v2/parcels?errors=verbose",
-				json={"parcels": parcels},
-				auth=(self.api_key, self.api_secret)
-			)
-			response_data = response.json()
+			response_data = run_sync(self.client.create_parcels(parcels))
 			if 'failed_parcels' in response_data:
 				error = response_data['failed_parcels'][0]['errors']
 				frappe.msgprint(_('Error occurred while creating Shipment: {0}').format(error),
 					indicator='orange', alert=True)
 			else:
-				shipment_id = ', '.join([str(x['id']) for x in response_data['parcels']])
-				awb_number = ', '.join([str(x['tracking_number']) for x in response_data['parcels']])
+				parcels = [{
+					'provider_parcel_id': str(x['id']),
+					'awb_number': str(x['tracking_number'])
+				} for x in response_data['parcels']]
 				return {
 					'service_provider': 'SendCloud',
-					'shipment_id': shipment_id,
+					'shipment_id': ', '.join([x['provider_parcel_id'] for x in parcels]),
 					'carrier': self.get_carrier(service_info['carrier'], post_or_get="post"),
 					'carrier_service': service_info['service_name'],
 					'shipment_amount': service_info['total_price'],
-					'awb_number': awb_number
+					'awb_number': ', '.join([x['awb_number'] for x in parcels]),
+					'parcels': parcels
 				}
 		except Exception:
-			show_error_alert("creating SendCloud Shipment")
+			show_error_alert("creating SendCloud Shipment", SENDCLOUD_PROVIDER)
 
-	def get_label(self, shipment_id):
+	def get_label(self, shipment_id, parcel_ids=None):
 		# Retrieve shipment label from SendCloud
-		shipment_id_list = shipment_id.split(', ')
+		shipment_id_list = parcel_ids or shipment_id.split(', ')
 		label_urls = []
 
 		try:
-			for ship_id in shipment_id_list:
-				shipment_label_response = \
-					requests.get('https://panel.sendcloud.sc/api/v2/labels/{id}'.format(id=ship_id), auth=(self.api_key, self.api_secret))
-				shipment_label = json.loads(shipment_label_response.text)
+			# labels of all parcels are fetched concurrently
+			for shipment_label in run_sync(self.client.get_labels(shipment_id_list)):
+				if isinstance(shipment_label, Exception):
+					raise shipment_label
 				label_urls.append(shipment_label['label']['label_printer'])
 			if len(label_urls):
 				return label_urls
@@ -111,34 +171,84 @@ class SendCloudUtils():
 				message = _("Please make sure Shipment (ID: {0}), exists and is a complete Shipment on SendCloud.").format(shipment_id)
 				frappe.msgprint(msg=_(message), title=_("Label Not Found"))
 		except Exception:
-			show_error_alert("printing SendCloud Label")
+			show_error_alert("printing SendCloud Label", SENDCLOUD_PROVIDER)
 
-	def get_tracking_data(self, shipment_id):
+	def get_label_documents(self, shipment_id, parcel_ids=None, dpi=203):
+		"""Returns a ('zpl', text) or ('pdf', bytes) pair per parcel of the shipment."""
+		documents = []
+		try:
+			for document in run_sync(self.client.get_label_documents(parcel_ids or shipment_id.split(', '), dpi)):
+				if isinstance(document, Exception):
+					raise document
+				documents.append(document)
+			return documents
+		except Exception:
+			show_error_alert("printing SendCloud Label", SENDCLOUD_PROVIDER)
+
+	def get_tracking_data(self, shipment_id, parcel_ids=None):
 		# return SendCloud tracking data
 		try:
-			shipment_id_list = shipment_id.split(', ')
-			awb_number, tracking_status, tracking_status_info, tracking_urls = [], [], [], []
-
-			for ship_id in shipment_id_list:
-				tracking_data_response = \
-					requests.get('https://panel.sendcloud.sc/api/v2/parcels/{id}'.format(id=ship_id),
-						auth=(self.api_key, self.api_secret))
-				tracking_data = json.loads(tracking_data_response.text)
-				tracking_data_parcel = tracking_data['parcel']
-				tracking_data_parcel_status = tracking_data_parcel['status']['message']
-
-				tracking_urls.append(tracking_data_parcel['tracking_url'])
-				awb_number.append(tracking_data_parcel['tracking_number'])
-				tracking_status.append(tracking_data_parcel_status)
-				tracking_status_info.append(tracking_data_parcel_status)
-			return {
-				'awb_number': ', '.join(awb_number),
-				'tracking_status': ', '.join(tracking_status),
-				'tracking_status_info': ', '.join(tracking_status_info),
-				'tracking_url': ', '.join(tracking_urls)
-			}
+			shipment_id_list = parcel_ids or shipment_id.split(', ')
+			# parcels of the shipment are fetched concurrently
+			responses = run_sync(self.client.get_parcels(shipment_id_list))
+			return self.get_tracking_dict(shipment_id_list, responses)
 		except Exception:
-			show_error_alert("updating SendCloud Shipment")
+			show_error_alert("updating SendCloud Shipment", SENDCLOUD_PROVIDER)
+			raise ShippingProviderError(_('SendCloud failed to return tracking data for {0}').format(shipment_id))
+
+	def get_bulk_tracking_data(self, shipment_ids, parcel_ids=None):
+		"""Returns the tracking data of many shipments, fetched concurrently, by shipment id.
+
+		`parcel_ids` optionally maps shipment ids to the ids of their parcels.
+		Shipments whose request failed are left out."""
+		parcel_ids = parcel_ids or {}
+		shipment_parcel_ids = [parcel_ids.get(shipment_id) or shipment_id.split(', ') for shipment_id in shipment_ids]
+		responses = run_sync(self.client.get_parcels([parcel_id for ids in shipment_parcel_ids for parcel_id in ids]))
+
+		bulk_tracking_data = {}
+		for shipment_id, ids in zip(shipment_ids, shipment_parcel_ids):
+			shipment_responses, responses = responses[:len(ids)], responses[len(ids):]
+			try:
+				bulk_tracking_data[shipment_id] = self.get_tracking_dict(ids, shipment_responses)
+			except Exception:
+				show_error_alert("updating SendCloud Shipment", SENDCLOUD_PROVIDER)
+		return bulk_tracking_data
+
+	def get_tracking_dict(self, parcel_ids, responses):
+		parcels = []
+		for ship_id, tracking_data in zip(parcel_ids, responses):
+			if isinstance(tracking_data, Exception):
+				raise tracking_data
+			parcels.append(self.get_parcel_tracking_dict(ship_id, tracking_data['parcel']))
+		return self.get_parcels_tracking_dict(parcels)
+
+	def get_parcel_tracking_dict(self, parcel_id, parcel):
+		tracking_data_parcel_status = parcel['status']['message']
+		return frappe._dict({
+			'provider_parcel_id': str(parcel_id),
+			'awb_number': parcel['tracking_number'],
+			'tracking_status': tracking_data_parcel_status,
+			'tracking_status_info': tracking_data_parcel_status,
+			'tracking_url': parcel['tracking_url']
+		})
+
+	def get_parcels_tracking_dict(self, parcels):
+		# The Shipment shows the values of all of its parcels
+		return {
+			'awb_number': ', '.join([d.get('awb_number') or '' for d in parcels]),
+			'tracking_status': ', '.join([d.get('tracking_status') or '' for d in parcels]),
+			'tracking_status_info': ', '.join([d.get('tracking_status_info') or '' for d in parcels]),
+			'tracking_url': ', '.join([d.get('tracking_url') or '' for d in parcels]),
+			'parcels': parcels
+		}
+
+	def sync_updated_parcels(self, updated_after, process_parcels):
+		"""Streams the parcels updated after `updated_after` page by page into `process_parcels`."""
+		async def sync():
+			async for parcels in self.client.iter_updated_parcels(to_iso_timestamp(updated_after)):
+				process_parcels([self.get_parcel_tracking_dict(parcel['id'], parcel) for parcel in parcels])
+
+		run_sync(sync())
 
 	def total_parcel_price(self, parcel_price, shipment_parcel):
 		count = 0
@@ -195,4 +305,63 @@ class SendCloudUtils():
 			'external_reference': "{}-{}".format(shipment, index),
 			'weight': parcel.get('weight'),
 			'parcel_items': self.get_parcel_items(parcel, description_of_content, value_of_goods)
-		}
\ No newline at end of file
+		}
+
+def to_iso_timestamp(datetime):
+	return pytz.timezone(get_time_zone()).localize(get_datetime(datetime)).isoformat()
+
+def sync_parcel_statuses():
+	"""Scheduled: update the Shipments whose SendCloud parcels changed since the last sync.
+
+	A few paginated requests per run instead of one request per open parcel."""
+	settings = frappe.get_single('SendCloud')
+	if not settings.enabled or not cint(settings.enable_delta_sync):
+		return
+
+	started_at = now_datetime()
+	updated_after = settings.last_parcel_sync or add_days(started_at, -INITIAL_SYNC_DAYS)
+	try:
+		SendCloudUtils().sync_updated_parcels(updated_after, update_changed_parcels)
+	except Exception:
+		# the watermark stays, so the next run picks up the same changes
+		show_error_alert("syncing SendCloud parcels", SENDCLOUD_PROVIDER)
+		return
+
+	frappe.db.set_value('SendCloud', 'SendCloud', 'last_parcel_sync',
+		add_to_date(started_at, minutes=-SYNC_OVERLAP_MINUTES))
+
+def update_changed_parcels(parcels):
+	# Update the Shipments of one page of parcels, skipping parcels whose status is unchanged
+	from erpnext_shipping.erpnext_shipping.shipping import set_tracking_data
+	from erpnext_shipping.erpnext_shipping.doctype.shipment_parcel_tracking.shipment_parcel_tracking import PARCEL_TRACKING_FIELDS
+
+	parcels = {parcel.provider_parcel_id: parcel for parcel in parcels}
+	if not parcels:
+		return
+
+	known_parcels = frappe.db.sql("""
+		select spt.parent as shipment, spt.provider_parcel_id, {fields}
+		from `tabShipment Parcel Tracking` spt
+		inner join `tabShipment` s on s.name = spt.parent
+		where spt.parenttype = 'Shipment' and spt.provider_parcel_id in %(parcel_ids)s
+			and s.service_provider = %(service_provider)s and s.docstatus = 1
+	""".format(fields=', '.join('spt.{0}'.format(field) for field in PARCEL_TRACKING_FIELDS[1:])),
+		{'parcel_ids': tuple(parcels), 'service_provider': SENDCLOUD_PROVIDER}, as_dict=1)
+
+	changed_shipments = set()
+	for known_parcel in known_parcels:
+		parcel = parcels[known_parcel.provider_parcel_id]
+		if any((known_parcel.get(field) or '') != (parcel.get(field) or '') for field in PARCEL_TRACKING_FIELDS[1:]):
+			changed_shipments.add(known_parcel.shipment)
+
+	utils = SendCloudUtils()
+	for shipment in changed_shipments:
+		shipment_id = frappe.db.get_value('Shipment', shipment, 'shipment_id')
+		rows = frappe.get_all('Shipment Parcel Tracking',
+			filters={'parent': shipment, 'parenttype': 'Shipment'},
+			fields=PARCEL_TRACKING_FIELDS,
+			order_by='idx asc'
+		)
+		tracking_data = utils.get_parcels_tracking_dict([parcels.get(row.provider_parcel_id) or row for row in rows])
+		delivery_notes = frappe.get_all('Shipment Delivery Note', filters={'parent': shipment}, pluck='delivery_note')
+		set_tracking_data(shipment, SENDCLOUD_PROVIDER, shipment_id, tracking_data, delivery_notes)
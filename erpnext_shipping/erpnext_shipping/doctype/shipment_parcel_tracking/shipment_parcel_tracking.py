@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+PARCEL_TRACKING_FIELDS = ['provider_parcel_id', 'awb_number', 'tracking_status', 'tracking_status_info', 'tracking_url']
+
+class ShipmentParcelTracking(Document):
+	pass
+
+def get_parcels(shipment_id, shipment_data):
+	# Return the per-parcel rows of a provider response.
+	# Providers booking a single parcel per Shipment don't return a list of their own.
+	if shipment_data.get('parcels'):
+		return shipment_data['parcels']
+	parcel = frappe._dict({'provider_parcel_id': shipment_id})
+	for field in PARCEL_TRACKING_FIELDS[1:]:
+		parcel[field] = shipment_data.get(field)
+	return [parcel]
+
+def get_provider_parcel_ids(shipment):
+	return frappe.get_all('Shipment Parcel Tracking',
+		filters={'parent': shipment, 'parenttype': 'Shipment'},
+		order_by='idx asc',
+		pluck='provider_parcel_id'
+	)
+
+def update_parcel_tracking(shipment, parcels):
+	# Insert or update the Shipment Parcel Tracking rows of a submitted Shipment.
+	existing = {d.provider_parcel_id: d for d in frappe.get_all('Shipment Parcel Tracking',
+		filters={'parent': shipment, 'parenttype': 'Shipment'},
+		fields=['name', 'idx'] + PARCEL_TRACKING_FIELDS
+	)}
+	idx = max([d.idx for d in existing.values()] or [0])
+
+	for parcel in parcels:
+		provider_parcel_id = str(parcel.get('provider_parcel_id'))
+		row = existing.get(provider_parcel_id)
+		if row:
+			values = {field: parcel.get(field) for field in PARCEL_TRACKING_FIELDS[1:]
+				if parcel.get(field) is not None and parcel.get(field) != row.get(field)}
+			if values:
+				frappe.db.set_value('Shipment Parcel Tracking', row.name, values, update_modified=False)
+			continue
+
+		idx += 1
+		row = frappe.new_doc('Shipment Parcel Tracking')
+		row.update({
+			'parent': shipment,
+			'parenttype': 'Shipment',
+			'parentfield': 'shipment_parcel_tracking',
+			'idx': idx,
+			'provider_parcel_id': provider_parcel_id,
+		})
+		for field in PARCEL_TRACKING_FIELDS[1:]:
+			row.set(field, parcel.get(field))
+		row.db_insert()
+
+@frappe.whitelist()
+def get_shipment_by_tracking_number(tracking_number):
+	# Return the Shipment a parcel belongs to by its AWB number or provider parcel id.
+	for field in ('awb_number', 'provider_parcel_id'):
+		shipment = frappe.db.get_value('Shipment Parcel Tracking',
+			{field: tracking_number, 'parenttype': 'Shipment'}, 'parent')
+		if shipment:
+			break
+	else:
+		# Shipments booked before parcels were tracked per row
+		shipment = frappe.db.get_value('Shipment', {'awb_number': tracking_number}, 'name') \
+			or frappe.db.get_value('Shipment', {'shipment_id': tracking_number}, 'name')
+
+	if shipment and frappe.has_permission('Shipment', 'read', shipment):
+		return shipment
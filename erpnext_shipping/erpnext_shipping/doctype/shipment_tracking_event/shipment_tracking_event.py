@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+TRACKING_FIELDS = ['awb_number', 'tracking_status', 'tracking_status_info', 'tracking_url']
+
+class ShipmentTrackingEvent(Document):
+	pass
+
+def on_doctype_update():
+	frappe.db.add_index('Shipment Tracking Event', ['shipment', 'timestamp'])
+
+def get_last_tracking_state(shipment):
+	# Return the latest recorded tracking state of a Shipment, if any.
+	events = frappe.get_all('Shipment Tracking Event',
+		filters={'shipment': shipment},
+		fields=TRACKING_FIELDS,
+		order_by='timestamp desc',
+		limit=1
+	)
+	return events[0] if events else None
+
+def record_tracking_event(shipment, service_provider, tracking_data):
+	"""Append a Shipment Tracking Event if the tracking state has changed.
+
+	Returns True if the state differs from the last known state of the Shipment."""
+	last_state = get_last_tracking_state(shipment)
+	known_state = last_state or frappe.db.get_value('Shipment', shipment, TRACKING_FIELDS, as_dict=1) or {}
+	changed = any((known_state.get(field) or '') != (tracking_data.get(field) or '') for field in TRACKING_FIELDS)
+
+	if changed or not last_state:
+		event = frappe.get_doc({
+			'doctype': 'Shipment Tracking Event',
+			'shipment': shipment,
+			'service_provider': service_provider,
+			'timestamp': now_datetime(),
+		})
+		for field in TRACKING_FIELDS:
+			event.set(field, tracking_data.get(field))
+		event.insert(ignore_permissions=True)
+
+	return changed
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import sys
+import json
+import frappe
+from frappe.utils import cint, now_datetime
+from frappe.model.document import Document
+from erpnext_shipping.erpnext_shipping.utils import get_fingerprint
+
+ERROR_COUNTS_KEY = 'shipping_error_counts'
+ERROR_DETAILS_KEY = 'shipping_error_details'
+ERROR_FIRST_SEEN_KEY = 'shipping_error_first_seen'
+ERROR_SAMPLE_KEY = 'shipping_error_sample'
+ERROR_SAMPLES_KEY = 'shipping_error_samples'
+# at most one traceback is logged per error in this many seconds
+ERROR_SAMPLE_INTERVAL = 10 * 60
+
+class ShippingErrorSummary(Document):
+	pass
+
+def capture_error(action, service_provider=None):
+	"""Count a provider failure under its fingerprint and return the name of its Shipping Error Summary.
+
+	Occurrences are only counted in the cache, a traceback is kept for a sample of them. The
+	summary and the Error Log of the sample are written by `flush_error_counts`, as the failing
+	request may still roll back its transaction."""
+	exception = sys.exc_info()[1]
+	exception_type = type(exception).__name__ if exception else 'Error'
+	fingerprint = get_fingerprint([service_provider, action, exception_type])
+	message = frappe.safe_decode(str(exception or ''))[:500]
+
+	cache = frappe.cache()
+	now = str(now_datetime())
+	sampled = cache.set(cache.make_key('{0}:{1}'.format(ERROR_SAMPLE_KEY, fingerprint)), 1,
+		nx=True, ex=ERROR_SAMPLE_INTERVAL)
+
+	# raw commands through a pipeline, the hash methods of the cache pickle their values
+	pipeline = cache.pipeline()
+	pipeline.hincrby(cache.make_key(ERROR_COUNTS_KEY), fingerprint, 1)
+	pipeline.hsetnx(cache.make_key(ERROR_FIRST_SEEN_KEY), fingerprint, now)
+	pipeline.hset(cache.make_key(ERROR_DETAILS_KEY), fingerprint, json.dumps({
+		'service_provider': service_provider,
+		'action': action,
+		'exception_type': exception_type,
+		'last_seen': now,
+		'last_message': message,
+	}))
+	if sampled:
+		pipeline.hset(cache.make_key(ERROR_SAMPLES_KEY), fingerprint, json.dumps({
+			'title': '{0} ({1})'.format(action, exception_type)[:140],
+			'traceback': frappe.get_traceback(),
+		}))
+	pipeline.execute()
+
+	return fingerprint
+
+def insert_error_summary(fingerprint, service_provider, action, exception_type, message, first_seen=None):
+	frappe.get_doc({
+		'doctype': 'Shipping Error Summary',
+		'fingerprint': fingerprint,
+		'service_provider': service_provider,
+		'action': action,
+		'exception_type': exception_type,
+		'first_seen': first_seen or now_datetime(),
+		'last_seen': now_datetime(),
+		'last_message': message,
+	}).insert(ignore_permissions=True)
+
+def flush_error_counts():
+	# Scheduled: add the counts collected in the cache to the summaries
+	cache = frappe.cache()
+	pipeline = cache.pipeline()
+	pipeline.hgetall(cache.make_key(ERROR_COUNTS_KEY))
+	pipeline.delete(cache.make_key(ERROR_COUNTS_KEY))
+	pipeline.hgetall(cache.make_key(ERROR_DETAILS_KEY))
+	pipeline.delete(cache.make_key(ERROR_DETAILS_KEY))
+	pipeline.hgetall(cache.make_key(ERROR_SAMPLES_KEY))
+	pipeline.delete(cache.make_key(ERROR_SAMPLES_KEY))
+	pipeline.hgetall(cache.make_key(ERROR_FIRST_SEEN_KEY))
+	pipeline.delete(cache.make_key(ERROR_FIRST_SEEN_KEY))
+	counts, _, details, _, samples, _, first_seen, _ = pipeline.execute()
+
+	# a sample may arrive a flush after its count
+	for key in set(counts) | set(samples):
+		fingerprint = frappe.safe_decode(key)
+		detail = json.loads(frappe.safe_decode(details.get(key) or '{}'))
+		if not frappe.db.exists('Shipping Error Summary', fingerprint):
+			insert_error_summary(fingerprint, detail.get('service_provider'), detail.get('action'),
+				detail.get('exception_type'), detail.get('last_message'), frappe.safe_decode(first_seen.get(key)))
+
+		if samples.get(key):
+			sample = json.loads(frappe.safe_decode(samples[key]))
+			error_log = frappe.log_error(sample.get('traceback'), sample.get('title'))
+			frappe.db.set_value('Shipping Error Summary', fingerprint, 'error_log', error_log.name, update_modified=False)
+
+		if not counts.get(key):
+			continue
+		frappe.db.sql("""
+			update `tabShipping Error Summary`
+			set `count` = `count` + %(count)s, last_seen = %(last_seen)s, last_message = %(last_message)s
+			where name = %(name)s
+		""", {
+			'count': cint(counts[key]),
+			'last_seen': detail.get('last_seen') or now_datetime(),
+			'last_message': detail.get('last_message'),
+			'name': fingerprint,
+		})
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import re
+from collections import defaultdict
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate, now_datetime, scrub
+from frappe.utils.csvutils import read_csv_content
+from frappe.model.document import Document
+
+PRICE_DEVIATION = 'Price Deviation'
+UNKNOWN_SHIPMENT = 'Unknown Shipment'
+DEFAULT_TOLERANCE = 2
+BATCH_SIZE = 1000
+# header names used by carriers for the columns of an invoice line
+INVOICE_COLUMNS = {
+	'shipment_id': ('shipment_id', 'shipment', 'shipment_number', 'consignment', 'consignment_number', 'reference'),
+	'awb_number': ('awb_number', 'awb', 'tracking_number', 'tracking', 'waybill', 'parcel_number'),
+	'amount': ('amount', 'invoiced_amount', 'net_amount', 'total', 'total_amount', 'price', 'charge'),
+	'invoice_number': ('invoice_number', 'invoice', 'invoice_no'),
+	'invoice_date': ('invoice_date', 'date'),
+}
+
+class ShippingInvoiceDiscrepancy(Document):
+	pass
+
+@frappe.whitelist()
+def reconcile_carrier_invoice(file_url, tolerance=DEFAULT_TOLERANCE, decimal_separator=None):
+	"""Compares a carrier invoice CSV with the booked Shipments and records the discrepancies.
+
+	Lines are summed per Shipment; a Shipment deviates if its invoiced amount differs from
+	its Shipment Amount by more than `tolerance` percent. Discrepancies already recorded for
+	the same invoice number and Shipment are not recorded again."""
+	frappe.only_for('System Manager')
+	lines = get_invoice_lines(frappe.get_doc('File', {'file_url': file_url}).get_content(), decimal_separator)
+	index, shipments = get_shipment_index()
+	reconciliation = frappe.generate_hash(length=10)
+
+	# one pass over the lines, joined to the Shipments through the index
+	invoiced, line_counts, invoices, unknown = defaultdict(float), defaultdict(int), {}, []
+	for line in lines:
+		shipment = index.get(line.shipment_id) or index.get(line.awb_number)
+		if not shipment:
+			unknown.append(line)
+			continue
+		invoiced[shipment] += line.amount
+		line_counts[shipment] += 1
+		invoices[shipment] = line
+
+	tolerance = flt(tolerance) / 100
+	discrepancies = []
+	for shipment, amount in invoiced.items():
+		quoted = flt(shipments[shipment].shipment_amount)
+		deviation = flt(amount - quoted, 2)
+		if abs(deviation) <= quoted * tolerance:
+			continue
+		discrepancies.append(get_discrepancy(PRICE_DEVIATION, invoices[shipment], shipments[shipment],
+			quoted, amount, deviation, line_counts[shipment]))
+	for line in unknown:
+		discrepancies.append(get_discrepancy(UNKNOWN_SHIPMENT, line, invoiced_amount=line.amount, invoice_lines=1))
+
+	price_deviations = len(discrepancies) - len(unknown)
+	# a re-imported invoice must not record its discrepancies twice
+	recorded = get_recorded_discrepancies({d[8] or '' for d in discrepancies})
+	new_discrepancies = [d for d in discrepancies if get_discrepancy_key(d[8], d[1], d[10], d[11]) not in recorded]
+	insert_discrepancies(reconciliation, new_discrepancies)
+	return {
+		'reconciliation': reconciliation,
+		'lines': len(lines),
+		'shipments': len(invoiced),
+		'price_deviations': price_deviations,
+		'unknown_lines': len(unknown),
+		'already_recorded': len(discrepancies) - len(new_discrepancies),
+	}
+
+def get_invoice_lines(content, decimal_separator=None):
+	rows = read_csv_content(content)
+	if not rows:
+		frappe.throw(_('The invoice file is empty'))
+
+	header = [scrub(column or '') for column in rows[0]]
+	positions = {}
+	for field, names in INVOICE_COLUMNS.items():
+		position = next((header.index(name) for name in names if name in header), None)
+		if position is not None:
+			positions[field] = position
+
+	if 'amount' not in positions or not ('shipment_id' in positions or 'awb_number' in positions):
+		frappe.throw(_('The invoice file needs an amount column and a shipment id or tracking number column'))
+
+	lines = []
+	for row in rows[1:]:
+		if not any(row):
+			continue
+		line = frappe._dict({field: (row[position] if position < len(row) else '') for field, position in positions.items()})
+		line.shipment_id = (line.shipment_id or '').strip()
+		line.awb_number = (line.awb_number or '').strip()
+		line.amount = parse_amount(line.amount, decimal_separator)
+		line.invoice_date = parse_date(line.invoice_date)
+		lines.append(line)
+	return lines
+
+def parse_amount(value, decimal_separator=None):
+	"""Returns the amount of an invoice cell such as "1.234,50", "1,234.50" or "EUR 12,50".
+
+	Without a `decimal_separator` the last '.' or ',' is the decimal separator, unless it is
+	a lone ',' followed by three digits, which groups thousands."""
+	value = re.sub(r'[^\d.,-]', '', value or '')
+	if decimal_separator not in ('.', ','):
+		position = max(value.rfind('.'), value.rfind(','))
+		decimal_separator = value[position] if position != -1 else '.'
+		if decimal_separator == ',' and value.count(',') == 1 and '.' not in value and len(value) - position == 4:
+			decimal_separator = '.'
+
+	thousands_separator = ',' if decimal_separator == '.' else '.'
+	return flt(value.replace(thousands_separator, '').replace(decimal_separator, '.'))
+
+def parse_date(value):
+	# an unreadable invoice date must not abort the import, the line is recorded without it
+	if not (value or '').strip():
+		return None
+	try:
+		return getdate(value.strip())
+	except (ValueError, OverflowError):
+		return None
+
+def get_shipment_index():
+	"""Returns a dict of every shipment id, parcel id and AWB number to its Shipment, and the Shipments."""
+	shipments = {d.name: d for d in frappe.db.sql("""
+		select name, service_provider, carrier, shipment_id, awb_number, shipment_amount
+		from `tabShipment`
+		where docstatus = 1 and ifnull(shipment_id, '') != ''
+	""", as_dict=1)}
+
+	index = {}
+	for shipment in shipments.values():
+		# SendCloud shipments join the ids and AWB numbers of their parcels
+		for key in (shipment.shipment_id or '').split(', ') + (shipment.awb_number or '').split(', '):
+			if key:
+				index[key] = shipment.name
+
+	for parent, parcel_id, awb_number in frappe.db.sql("""
+		select parent, provider_parcel_id, awb_number from `tabShipment Parcel Tracking`
+		where parenttype = 'Shipment'
+	"""):
+		if parent in shipments:
+			for key in (parcel_id, awb_number):
+				if key:
+					index[key] = parent
+	index.pop('', None)
+	return index, shipments
+
+def get_discrepancy(discrepancy_type, line, shipment=None, quoted_amount=0, invoiced_amount=0, deviation=0,
+	invoice_lines=0):
+	shipment = shipment or frappe._dict()
+	return (
+		discrepancy_type,
+		shipment.name,
+		shipment.service_provider,
+		shipment.carrier,
+		quoted_amount,
+		invoiced_amount,
+		deviation,
+		flt(deviation / quoted_amount * 100, 2) if quoted_amount else 0,
+		line.invoice_number,
+		line.invoice_date,
+		shipment.shipment_id or line.shipment_id,
+		shipment.awb_number or line.awb_number,
+		invoice_lines,
+	)
+
+def get_discrepancy_key(invoice_number, shipment, shipment_id, awb_number):
+	# lines without a Shipment are told apart by their shipment id and tracking number
+	return (invoice_number or '', shipment or '', '' if shipment else shipment_id or '', '' if shipment else awb_number or '')
+
+def get_recorded_discrepancies(invoice_numbers):
+	recorded = set()
+	invoice_numbers = list(invoice_numbers)
+	for i in range(0, len(invoice_numbers), BATCH_SIZE):
+		for d in frappe.db.sql("""
+			select invoice_number, shipment, shipment_id, awb_number from `tabShipping Invoice Discrepancy`
+			where ifnull(invoice_number, '') in %s
+		""", (tuple(invoice_numbers[i:i + BATCH_SIZE]),), as_dict=1):
+			recorded.add(get_discrepancy_key(d.invoice_number, d.shipment, d.shipment_id, d.awb_number))
+	return recorded
+
+def insert_discrepancies(reconciliation, discrepancies):
+	now, user = now_datetime(), frappe.session.user
+	frappe.db.bulk_insert('Shipping Invoice Discrepancy', [
+		'name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus', 'status', 'reconciliation',
+		'discrepancy_type', 'shipment', 'service_provider', 'carrier', 'quoted_amount', 'invoiced_amount',
+		'deviation', 'deviation_percent', 'invoice_number', 'invoice_date', 'shipment_id', 'awb_number',
+		'invoice_lines',
+	], [(frappe.generate_hash(length=10), now, now, user, user, 0, 'Open', reconciliation) + discrepancy
+		for discrepancy in discrepancies])
@@ -0,0 +1,53 @@
+frappe.listview_settings['Shipping Invoice Discrepancy'] = {
+	get_indicator: function(doc) {
+		return [__(doc.status), doc.status == 'Open' ? 'orange' : 'green', 'status,=,' + doc.status];
+	},
+
+	onload: function(listview) {
+		listview.page.add_inner_button(__('Reconcile Carrier Invoice'), function() {
+			const dialog = new frappe.ui.Dialog({
+				title: __('Reconcile Carrier Invoice'),
+				fields: [
+					{
+						fieldname: 'file_url',
+						fieldtype: 'Attach',
+						label: __('Invoice CSV'),
+						reqd: 1,
+						description: __('Needs an amount column and a shipment id or tracking number column')
+					},
+					{
+						fieldname: 'tolerance',
+						fieldtype: 'Percent',
+						label: __('Tolerance'),
+						default: 2,
+						description: __('Invoiced amounts within this share of the Shipment Amount are not recorded')
+					},
+					{
+						fieldname: 'decimal_separator',
+						fieldtype: 'Select',
+						label: __('Decimal Separator'),
+						options: [
+							{value: '', label: __('Detect')},
+							{value: '.', label: __('Point (12.50)')},
+							{value: ',', label: __('Comma (12,50)')}
+						],
+						description: __('Separator of the decimals in the amount column')
+					}
+				],
+				primary_action_label: __('Reconcile'),
+				primary_action: function(values) {
+					frappe.dom.freeze(__('Reconciling Invoice'));
+					frappe.xcall('erpnext_shipping.erpnext_shipping.doctype.shipping_invoice_discrepancy.shipping_invoice_discrepancy.reconcile_carrier_invoice', values)
+						.then((result) => {
+							dialog.hide();
+							frappe.msgprint(__('{0} invoice lines of {1} Shipments reconciled: {2} price deviations, {3} lines without a Shipment, {4} of them recorded before.',
+								[result.lines, result.shipments, result.price_deviations, result.unknown_lines, result.already_recorded]));
+							frappe.set_route('List', 'Shipping Invoice Discrepancy', {reconciliation: result.reconciliation});
+						})
+						.finally(() => frappe.dom.unfreeze());
+				}
+			});
+			dialog.show();
+		});
+	}
+};
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+# import frappe
+import unittest
+from erpnext_shipping.erpnext_shipping.doctype.shipping_invoice_discrepancy.shipping_invoice_discrepancy import (
+	get_discrepancy_key, parse_amount, parse_date)
+
+class TestShippingInvoiceDiscrepancy(unittest.TestCase):
+	def test_parse_amount(self):
+		self.assertEqual(parse_amount('12.50'), 12.5)
+		self.assertEqual(parse_amount('12,50'), 12.5)
+		self.assertEqual(parse_amount('EUR 1.234,50'), 1234.5)
+		self.assertEqual(parse_amount('1,234.50'), 1234.5)
+		self.assertEqual(parse_amount('1,234'), 1234)
+		self.assertEqual(parse_amount('-3,2'), -3.2)
+		self.assertEqual(parse_amount(''), 0)
+
+	def test_parse_amount_with_separator(self):
+		self.assertEqual(parse_amount('1,234', ','), 1.234)
+		self.assertEqual(parse_amount('1.234', ','), 1234)
+		self.assertEqual(parse_amount('1.234', '.'), 1.234)
+
+	def test_parse_date(self):
+		self.assertEqual(str(parse_date('2026-03-01')), '2026-03-01')
+		self.assertIsNone(parse_date('not a date'))
+		self.assertIsNone(parse_date(''))
+
+	def test_discrepancy_key(self):
+		# lines of a Shipment match by Shipment, lines without one by their ids
+		self.assertEqual(get_discrepancy_key('INV-1', 'SHIP-1', 'A', 'B'), get_discrepancy_key('INV-1', 'SHIP-1', 'C', None))
+		self.assertNotEqual(get_discrepancy_key('INV-1', None, 'A', 'B'), get_discrepancy_key('INV-1', None, 'C', 'B'))
+		self.assertEqual(get_discrepancy_key(None, None, 'A', None), get_discrepancy_key('', '', 'A', ''))
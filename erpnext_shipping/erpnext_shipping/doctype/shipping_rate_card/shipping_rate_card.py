@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import json
+from bisect import bisect_left
+import frappe
+from frappe import _
+from frappe.utils import flt, cint, cstr
+from frappe.utils.csvutils import read_csv_content
+from frappe.model.document import Document
+from erpnext_shipping.erpnext_shipping.cartonization import DEFAULT_VOLUMETRIC_DIVISOR, get_chargeable_weight
+from erpnext_shipping.erpnext_shipping.providers import RATE_CARD_PROVIDER
+
+RATE_CARD_CACHE_KEY = 'shipping_rate_card'
+
+class ShippingRateCard(Document):
+	def validate(self):
+		if self.is_new() or self.has_value_changed('zone_map_file'):
+			self.zone_map = json.dumps(self.parse_zone_map_file())
+		if self.is_new() or self.has_value_changed('rate_file'):
+			self.rates = json.dumps(self.parse_rate_file())
+
+	def on_update(self):
+		frappe.cache().hdel(RATE_CARD_CACHE_KEY, self.name)
+
+	def on_trash(self):
+		frappe.cache().hdel(RATE_CARD_CACHE_KEY, self.name)
+
+	def after_rename(self, old_name, new_name, merge=False):
+		frappe.cache().hdel(RATE_CARD_CACHE_KEY, old_name)
+
+	def parse_zone_map_file(self):
+		"""Returns {country_code: {zip_prefix: zone}} from the Zone Map File."""
+		zone_map = {}
+		for row in self.read_file_rows(self.zone_map_file, ['country', 'zip_prefix', 'zone']):
+			country = row[0].strip().upper()
+			if len(country) != 2:
+				country = (frappe.db.get_value('Country', row[0].strip(), 'code') or '').upper()
+			if not country:
+				frappe.throw(_('Unknown country {0} in the Zone Map File').format(frappe.bold(row[0])))
+			zone_map.setdefault(country, {})[row[1].replace(' ', '').upper()] = row[2].strip()
+		return zone_map
+
+	def parse_rate_file(self):
+		"""Returns {zone: [bands, prices]} from the Rate File, with the sorted weight bands of each zone."""
+		rows = self.read_file_rows(self.rate_file, ['zone', 'max_weight', 'price'])
+		zones = {}
+		for row in rows:
+			zones.setdefault(row[0].strip(), {})[flt(row[1])] = flt(row[2])
+		return {'zones': get_zone_rates(zones)}
+
+	def read_file_rows(self, file_url, columns):
+		content = frappe.get_doc('File', {'file_url': file_url}).get_content()
+		rows = [row for row in read_csv_content(content) if any(row)]
+		if rows and [cstr(d).strip().lower() for d in rows[0][:len(columns)]] == columns:
+			rows = rows[1:]
+		for idx, row in enumerate(rows, start=1):
+			if len(row) < len(columns):
+				frappe.throw(_('Row {0} of {1} needs the columns {2}').format(idx, file_url, ', '.join(columns)))
+		return rows
+
+def get_zone_rates(prices_by_zone):
+	# {zone: {max_weight: price}} to {zone: [sorted bands, their prices]}
+	zone_rates = {}
+	for zone, prices in prices_by_zone.items():
+		bands = sorted(prices)
+		zone_rates[zone] = [bands, [prices[band] for band in bands]]
+	return zone_rates
+
+def get_compiled_rate_card(rate_card):
+	# Return the rate card with its zone map and rates parsed, cached until it is saved again.
+	def generator():
+		doc = frappe.get_doc('Shipping Rate Card', rate_card)
+		zone_map = json.loads(doc.zone_map or '{}')
+		rates = json.loads(doc.rates or '{}')
+		return frappe._dict({
+			'name': doc.name,
+			'parcel_service': doc.parcel_service,
+			'parcel_service_type': doc.parcel_service_type,
+			'volumetric_divisor': cint(doc.volumetric_divisor) or DEFAULT_VOLUMETRIC_DIVISOR,
+			'max_weight': flt(doc.max_weight),
+			'max_length': flt(doc.max_length),
+			'handling_fee': flt(doc.handling_fee),
+			'fuel_surcharge': flt(doc.fuel_surcharge),
+			'oversize_length': flt(doc.oversize_length),
+			'oversize_surcharge': flt(doc.oversize_surcharge),
+			'zone_map': zone_map,
+			# longest prefixes first, so the most specific zone wins
+			'prefix_lengths': {country: sorted(set(len(prefix) for prefix in zones), reverse=True)
+				for country, zones in zone_map.items()},
+			'zones': rates.get('zones', {}),
+		})
+	return frappe.cache().hget(RATE_CARD_CACHE_KEY, rate_card, generator=generator)
+
+def get_zone(rate_card, country_code, pincode):
+	zones = rate_card.zone_map.get(country_code.upper())
+	if not zones:
+		return None
+	pincode = (pincode or '').upper()
+	for length in rate_card.prefix_lengths[country_code.upper()]:
+		zone = zones.get(pincode[:length])
+		if zone:
+			return zone
+
+def get_rate_card_price(rate_card, delivery_address, shipment_parcel):
+	"""Returns the total price for the parcels, or None if the rate card doesn't cover them."""
+	zone_rates = rate_card.zones.get(get_zone(rate_card, delivery_address.country_code, delivery_address.pincode))
+	if not zone_rates:
+		return None
+
+	bands, prices = zone_rates
+
+	total_price = 0
+	for parcel in shipment_parcel:
+		dimensions = [flt(parcel.get('length')), flt(parcel.get('width')), flt(parcel.get('height'))]
+		if rate_card.max_length and max(dimensions) > rate_card.max_length:
+			return None
+
+		chargeable_weight = get_chargeable_weight(parcel, rate_card.volumetric_divisor)
+		if rate_card.max_weight and chargeable_weight > rate_card.max_weight:
+			return None
+
+		# the lightest band of this zone that takes the weight
+		band = bisect_left(bands, chargeable_weight)
+		if band >= len(bands):
+			return None
+
+		price = prices[band] + rate_card.handling_fee
+		if rate_card.oversize_length and max(dimensions) > rate_card.oversize_length:
+			price += rate_card.oversize_surcharge
+		total_price += price * cint(parcel.get('count') or 1)
+
+	return flt(total_price * (1 + rate_card.fuel_surcharge / 100), 2)
+
+def is_rate_card_enabled():
+	return bool(frappe.db.exists('Shipping Rate Card', {'enabled': 1}))
+
+
+class RateCardUtils():
+	def get_available_services(self, pickup_address, delivery_address, shipment_parcel):
+		# Compute rates locally from the enabled rate cards for the pickup country
+		shipment_parcel = json.loads(shipment_parcel)
+		rate_cards = frappe.get_all('Shipping Rate Card',
+			filters={'enabled': 1, 'from_country': pickup_address.country}, pluck='name')
+
+		available_services = []
+		for rate_card in rate_cards:
+			rate_card = get_compiled_rate_card(rate_card)
+			total_price = get_rate_card_price(rate_card, delivery_address, shipment_parcel)
+			if total_price is not None:
+				available_services.append(self.get_service_dict(rate_card, total_price))
+		return available_services
+
+	def create_shipment(self, shipment, delivery_address, shipment_parcel, service_info):
+		# Rate card services are booked with the carrier outside of ERPNext,
+		# so the Shipment is its own reference. The price is computed again
+		# instead of trusting the price sent back by the client.
+		rate_card = get_compiled_rate_card(service_info['rate_card'])
+		total_price = get_rate_card_price(rate_card, delivery_address, json.loads(shipment_parcel))
+		if total_price is None:
+			frappe.throw(_('Rate Card {0} does not cover this Shipment anymore').format(rate_card.name))
+
+		return {
+			'service_provider': RATE_CARD_PROVIDER,
+			'shipment_id': shipment,
+			'carrier': rate_card.parcel_service,
+			'carrier_service': rate_card.parcel_service_type,
+			'shipment_amount': total_price,
+			'awb_number': '',
+		}
+
+	def get_service_dict(self, rate_card, total_price):
+		"""Returns a dictionary with service info."""
+		available_service = frappe._dict()
+		available_service.service_provider = RATE_CARD_PROVIDER
+		available_service.carrier = rate_card.parcel_service
+		available_service.carrier_name = rate_card.parcel_service_type
+		available_service.service_name = rate_card.parcel_service_type
+		available_service.is_preferred = frappe.db.get_value('Parcel Service Type',
+			rate_card.parcel_service_type, 'show_in_preferred_services_list') or 0
+		available_service.total_price = total_price
+		available_service.rate_card = rate_card.name
+		return available_service
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+import frappe
+import unittest
+from erpnext_shipping.erpnext_shipping.doctype.shipping_rate_card.shipping_rate_card import get_rate_card_price, \
+	get_zone_rates
+
+class TestShippingRateCard(unittest.TestCase):
+	def setUp(self):
+		self.rate_card = frappe._dict({
+			'volumetric_divisor': 5000,
+			'max_weight': 0,
+			'max_length': 0,
+			'handling_fee': 0,
+			'fuel_surcharge': 0,
+			'oversize_length': 0,
+			'oversize_surcharge': 0,
+			'zone_map': {'DE': {'1': 'A', '2': 'B'}},
+			'prefix_lengths': {'DE': [1]},
+			'zones': get_zone_rates({'A': {1: 4.0, 5: 6.0}, 'B': {2: 5.0, 10: 9.0}}),
+		})
+
+	def get_price(self, pincode, weight, count=1):
+		address = frappe._dict({'country_code': 'DE', 'pincode': pincode})
+		parcel = {'length': 10, 'width': 10, 'height': 10, 'weight': weight, 'count': count}
+		return get_rate_card_price(self.rate_card, address, [parcel])
+
+	def test_bands_of_the_zone(self):
+		# 1.5 kg falls between the bands of zone B, zone A prices it in its own 5 kg band
+		self.assertEqual(self.get_price('10115', 1.5), 6.0)
+		self.assertEqual(self.get_price('20095', 1.5), 5.0)
+		self.assertEqual(self.get_price('10115', 1), 4.0)
+
+	def test_not_covered(self):
+		self.assertIsNone(self.get_price('10115', 6))
+		self.assertIsNone(self.get_price('90402', 1))
+
+	def test_surcharges(self):
+		self.rate_card.update({'handling_fee': 1, 'fuel_surcharge': 10})
+		self.assertEqual(self.get_price('20095', 8, count=2), 22.0)
@@ -0,0 +1,14 @@
+// Copyright (c) 2026, Frappe and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Shipping Retry Job', {
+	refresh: function(frm) {
+		if (frm.doc.status == 'Dead') {
+			frm.add_custom_button(__('Retry'), function() {
+				frappe.xcall('erpnext_shipping.erpnext_shipping.doctype.shipping_retry_job.shipping_retry_job.requeue_retry_jobs', {
+					names: [frm.doc.name]
+				}).then(() => frm.reload_doc());
+			});
+		}
+	}
+});
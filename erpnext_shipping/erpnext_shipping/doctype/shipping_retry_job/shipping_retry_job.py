@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import json
+import random
+import frappe
+from six import string_types
+from frappe.utils import cint, now_datetime, add_to_date
+from frappe.model.document import Document
+from erpnext_shipping.erpnext_shipping.utils import get_fingerprint
+
+UPDATE_TRACKING = 'Update Tracking'
+# methods run for every operation, they raise to signal a failed attempt
+RETRY_OPERATIONS = {
+	UPDATE_TRACKING: 'erpnext_shipping.erpnext_shipping.shipping.retry_update_tracking',
+}
+# longest delay between two attempts, in seconds
+MAX_RETRY_DELAY = 24 * 60 * 60
+# Running jobs older than this were lost with their worker and are queued again
+STALE_JOB_MINUTES = 30
+BATCH_SIZE = 500
+
+class ShippingRetryJob(Document):
+	pass
+
+class ShippingRetryError(frappe.ValidationError):
+	pass
+
+def enqueue_retry(operation, service_provider, arguments, reference_doctype=None, reference_name=None):
+	# Queue a failed provider operation for a retry, unless the same one is already queued
+	fingerprint = get_fingerprint([operation, service_provider, arguments])
+	if frappe.db.exists('Shipping Retry Job', {'fingerprint': fingerprint, 'status': ('in', ('Queued', 'Running'))}):
+		return
+
+	settings = frappe.get_cached_doc('Shipping Settings')
+	frappe.get_doc({
+		'doctype': 'Shipping Retry Job',
+		'operation': operation,
+		'service_provider': service_provider,
+		'reference_doctype': reference_doctype,
+		'reference_name': reference_name,
+		'fingerprint': fingerprint,
+		'arguments': json.dumps(arguments, indent=1, default=str),
+		'max_attempts': cint(settings.retry_max_attempts) or 5,
+		'next_attempt_at': get_next_attempt_at(0),
+	}).insert(ignore_permissions=True)
+
+def get_next_attempt_at(attempts):
+	# Exponential backoff with some jitter, so retries of one outage do not all fire at once
+	base_delay = cint(frappe.get_cached_doc('Shipping Settings').retry_base_delay) or 300
+	delay = min(base_delay * 2 ** attempts, MAX_RETRY_DELAY)
+	return add_to_date(now_datetime(), seconds=int(delay * random.uniform(1, 1.1)))
+
+def process_retry_jobs():
+	# Scheduled every minute: start the due jobs, at most `retry_concurrency` at a time per provider
+	requeue_stale_jobs()
+	concurrency = cint(frappe.get_cached_doc('Shipping Settings').retry_concurrency) or 5
+	running = dict(frappe.db.sql("""
+		select service_provider, count(*) from `tabShipping Retry Job`
+		where status = 'Running' group by service_provider
+	"""))
+
+	due_jobs = frappe.get_all('Shipping Retry Job', filters={
+		'status': 'Queued',
+		'next_attempt_at': ('<=', now_datetime()),
+	}, fields=['name', 'service_provider'], order_by='next_attempt_at asc', limit_page_length=BATCH_SIZE)
+
+	for job in due_jobs:
+		if running.get(job.service_provider, 0) >= concurrency:
+			continue
+
+		frappe.db.set_value('Shipping Retry Job', job.name, 'status', 'Running')
+		running[job.service_provider] = running.get(job.service_provider, 0) + 1
+		frappe.enqueue('erpnext_shipping.erpnext_shipping.doctype.shipping_retry_job.shipping_retry_job.run_retry_job',
+			name=job.name, enqueue_after_commit=True)
+
+def requeue_stale_jobs():
+	frappe.db.sql("""
+		update `tabShipping Retry Job` set status = 'Queued'
+		where status = 'Running' and modified < %s
+	""", add_to_date(now_datetime(), minutes=-STALE_JOB_MINUTES))
+
+def run_retry_job(name):
+	job = frappe.get_doc('Shipping Retry Job', name)
+	job.attempts += 1
+	job.last_attempt_at = now_datetime()
+	try:
+		frappe.get_attr(RETRY_OPERATIONS[job.operation])(**json.loads(job.arguments))
+	except Exception:
+		frappe.db.rollback()
+		job.last_error = frappe.get_traceback()
+		if job.attempts >= job.max_attempts:
+			job.status = 'Dead'
+			job.next_attempt_at = None
+		else:
+			job.status = 'Queued'
+			job.next_attempt_at = get_next_attempt_at(job.attempts)
+	else:
+		job.status = 'Completed'
+		job.next_attempt_at = None
+	job.save(ignore_permissions=True)
+
+@frappe.whitelist()
+def requeue_retry_jobs(names):
+	# Give Dead jobs a fresh set of attempts
+	frappe.only_for('System Manager')
+	if isinstance(names, string_types):
+		names = json.loads(names)
+
+	for name in names:
+		job = frappe.get_doc('Shipping Retry Job', name)
+		if job.status != 'Dead':
+			continue
+		job.status = 'Queued'
+		job.attempts = 0
+		job.next_attempt_at = now_datetime()
+		job.save()
+
+def clear_completed_retry_jobs():
+	# Daily, completed jobs are only kept for a week
+	frappe.db.sql("""
+		delete from `tabShipping Retry Job`
+		where status = 'Completed' and modified < %s
+	""", add_to_date(now_datetime(), days=-7))
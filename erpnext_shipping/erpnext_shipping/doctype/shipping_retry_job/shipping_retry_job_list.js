@@ -0,0 +1,21 @@
+frappe.listview_settings['Shipping Retry Job'] = {
+	get_indicator: function(doc) {
+		const colors = {
+			'Queued': 'orange',
+			'Running': 'blue',
+			'Completed': 'green',
+			'Dead': 'red'
+		};
+		return [__(doc.status), colors[doc.status], 'status,=,' + doc.status];
+	},
+
+	onload: function(listview) {
+		// Dead jobs form the dead-letter queue, they can be queued again from here
+		listview.page.add_actions_menu_item(__('Retry'), function() {
+			const names = listview.get_checked_items(true);
+			frappe.xcall('erpnext_shipping.erpnext_shipping.doctype.shipping_retry_job.shipping_retry_job.requeue_retry_jobs', {
+				names: names
+			}).then(() => listview.refresh());
+		});
+	}
+};
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.utils import flt, cint
+from frappe.model.document import Document
+
+# compiled rules per site, rebuilt whenever a rule changes
+compiled_rules = {}
+
+class ShippingServiceRule(Document):
+	def validate(self):
+		if flt(self.max_weight) and flt(self.min_weight) > flt(self.max_weight):
+			frappe.throw(_('Min Weight cannot be greater than Max Weight'))
+
+def get_carriers(carriers):
+	return {carrier.strip().upper() for carrier in (carriers or '').splitlines() if carrier.strip()}
+
+def compile_rule(rule):
+	"""Returns the rule as a pair of predicates: `applies(context)` for the Shipment
+	and `accepts(service, context)` for its services, plus the key to select by."""
+	# values are converted once here, not per evaluated service
+	from_country, to_country = rule.from_country, rule.to_country
+	min_weight, max_weight = flt(rule.min_weight), flt(rule.max_weight)
+	max_price_per_kg, max_transit_days = flt(rule.max_price_per_kg), cint(rule.max_transit_days)
+
+	conditions = []
+	if from_country:
+		conditions.append(lambda context: context.from_country == from_country)
+	if to_country:
+		conditions.append(lambda context: context.to_country == to_country)
+	if min_weight:
+		conditions.append(lambda context: context.weight >= min_weight)
+	if max_weight:
+		conditions.append(lambda context: context.weight <= max_weight)
+
+	# estimates cannot be booked
+	filters = [lambda service, context: not service.get('is_estimate')]
+	if cint(rule.preferred_only):
+		filters.append(lambda service, context: cint(service.get('is_preferred')))
+	allowed_carriers, denied_carriers = get_carriers(rule.allowed_carriers), get_carriers(rule.denied_carriers)
+	if allowed_carriers:
+		filters.append(lambda service, context: (service.get('carrier') or '').upper() in allowed_carriers)
+	if denied_carriers:
+		filters.append(lambda service, context: (service.get('carrier') or '').upper() not in denied_carriers)
+	if max_price_per_kg:
+		filters.append(lambda service, context: context.weight > 0
+			and flt(service.get('total_price')) / context.weight <= max_price_per_kg)
+	if max_transit_days:
+		filters.append(lambda service, context: service.get('transit_days') is not None
+			and cint(service.get('transit_days')) <= max_transit_days)
+
+	if rule.select_by == 'Fastest':
+		sort_key = lambda service: (cint(service.get('transit_days')) if service.get('transit_days') is not None
+			else float('inf'), flt(service.get('total_price')))
+	else:
+		sort_key = lambda service: flt(service.get('total_price'))
+
+	return frappe._dict({
+		'name': rule.name,
+		'applies': lambda context: all(condition(context) for condition in conditions),
+		'accepts': lambda service, context: all(service_filter(service, context) for service_filter in filters),
+		'sort_key': sort_key,
+	})
+
+def get_compiled_rules():
+	# Rules are only compiled again after one was added, changed or removed
+	version = frappe.db.sql("""
+		select count(*), max(modified) from `tabShipping Service Rule` where enabled = 1
+	""")[0]
+	site_rules = compiled_rules.get(frappe.local.site)
+	if not site_rules or site_rules[0] != version:
+		rules = frappe.get_all('Shipping Service Rule', filters={'enabled': 1}, fields='*',
+			order_by='priority desc, name asc')
+		site_rules = (version, [compile_rule(frappe._dict(rule)) for rule in rules])
+		compiled_rules[frappe.local.site] = site_rules
+	return site_rules[1]
+
+def get_rule_context(pickup_address, delivery_address, weight):
+	return frappe._dict({
+		'from_country': pickup_address.get('country'),
+		'to_country': delivery_address.get('country'),
+		'weight': flt(weight),
+	})
+
+def select_service(services, context, rules=None):
+	"""Returns the service selected by the first rule that applies and accepts one, and the rule's name."""
+	for rule in (rules if rules is not None else get_compiled_rules()):
+		if not rule.applies(context):
+			continue
+		candidates = [service for service in services if rule.accepts(service, context)]
+		if candidates:
+			return min(candidates, key=rule.sort_key), rule.name
+	return None, None
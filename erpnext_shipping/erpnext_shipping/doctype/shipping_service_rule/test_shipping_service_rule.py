@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+import frappe
+import unittest
+from erpnext_shipping.erpnext_shipping.doctype.shipping_service_rule.shipping_service_rule import compile_rule, \
+	select_service
+
+SERVICES = [
+	{'carrier': 'DHL', 'total_price': 12, 'transit_days': 2, 'is_preferred': 1},
+	{'carrier': 'DPD', 'total_price': 8, 'transit_days': 4, 'is_preferred': 0},
+	{'carrier': 'UPS', 'total_price': 6, 'is_estimate': 1},
+]
+
+def get_rule(**values):
+	return compile_rule(frappe._dict(dict({'name': 'Test Rule', 'select_by': 'Cheapest'}, **values)))
+
+def get_context(**values):
+	return frappe._dict(dict({'from_country': 'Germany', 'to_country': 'Germany', 'weight': 2}, **values))
+
+class TestShippingServiceRule(unittest.TestCase):
+	def test_cheapest_skips_estimates(self):
+		service, rule = select_service(SERVICES, get_context(), [get_rule()])
+		self.assertEqual(service['carrier'], 'DPD')
+		self.assertEqual(rule, 'Test Rule')
+
+	def test_fastest(self):
+		service, rule = select_service(SERVICES, get_context(), [get_rule(select_by='Fastest')])
+		self.assertEqual(service['carrier'], 'DHL')
+
+	def test_conditions(self):
+		rules = [get_rule(name='Austria', to_country='Austria'), get_rule(name='Heavy', min_weight=10),
+			get_rule(name='Fallback', denied_carriers='dpd\n')]
+		service, rule = select_service(SERVICES, get_context(), rules)
+		self.assertEqual((service['carrier'], rule), ('DHL', 'Fallback'))
+
+	def test_filters(self):
+		self.assertEqual(select_service(SERVICES, get_context(), [get_rule(max_price_per_kg=5)])[0]['carrier'], 'DPD')
+		self.assertEqual(select_service(SERVICES, get_context(), [get_rule(max_transit_days=3)])[0]['carrier'], 'DHL')
+		self.assertEqual(select_service(SERVICES, get_context(), [get_rule(allowed_carriers='DHL')])[0]['carrier'], 'DHL')
+		self.assertEqual(select_service(SERVICES, get_context(), [get_rule(preferred_only=1, max_price_per_kg=5)]),
+			(None, None))
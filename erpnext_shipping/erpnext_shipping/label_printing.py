@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""ZPL labels for thermal printers.
+
+Labels are requested as ZPL where the provider supports it (SendCloud). PDF labels
+are rendered locally into a ZPL graphic field, which requires PyMuPDF and Pillow;
+the converted labels are cached by the hash of their PDF. The labels are streamed
+to a raw TCP print server (port 9100) configured in Shipping Settings, or returned
+for download if none is configured."""
+from __future__ import unicode_literals
+import json
+import socket
+import hashlib
+import binascii
+import itertools
+import frappe
+from frappe import _
+from frappe.utils import cint
+from erpnext_shipping.erpnext_shipping.client import AsyncProviderClient, gather_limited, run_sync
+from erpnext_shipping.erpnext_shipping.providers import LETMESHIP_PROVIDER, PACKLINK_PROVIDER, SENDCLOUD_PROVIDER
+from erpnext_shipping.erpnext_shipping.shipping import call_provider
+from erpnext_shipping.erpnext_shipping.doctype.shipment_parcel_tracking.shipment_parcel_tracking import get_provider_parcel_ids
+
+ZPL_LABEL_KEY = 'shipping_zpl_label'
+ZPL_LABEL_EXPIRY = 7 * 24 * 60 * 60
+DEFAULT_DPI = 203
+DEFAULT_PRINTER_PORT = 9100
+PRINTER_TIMEOUT = 10
+
+
+class LabelClient(AsyncProviderClient):
+	# Downloads label documents from the URLs returned by a provider, without its credentials
+	def __init__(self, provider):
+		super(LabelClient, self).__init__()
+		self.provider = provider
+
+	async def download_all(self, urls):
+		async with self:
+			return await gather_limited([self.download(url) for url in urls])
+
+
+@frappe.whitelist()
+def print_zpl_label(service_provider, shipment_id, shipment=None):
+	"""Sends the ZPL labels of a shipment to the label printer, returns them if no printer is configured."""
+	if shipment:
+		frappe.has_permission('Shipment', 'read', shipment, throw=True)
+	settings = frappe.get_cached_doc('Shipping Settings')
+	labels = iter_zpl_labels(service_provider, shipment_id, shipment, cint(settings.zpl_dpi) or DEFAULT_DPI)
+	if not settings.zpl_printer_host:
+		return {'zpl': ''.join(labels)}
+
+	count = send_to_printer(labels, settings.zpl_printer_host, cint(settings.zpl_printer_port) or DEFAULT_PRINTER_PORT)
+	return {'printed': count}
+
+
+def iter_zpl_labels(service_provider, shipment_id, shipment=None, dpi=DEFAULT_DPI):
+	# Yields one ZPL label per page, as soon as its document is fetched or converted
+	for label_format, content in get_label_documents(service_provider, shipment_id, shipment, dpi):
+		if label_format == 'zpl':
+			yield content
+		else:
+			for label in get_cached_zpl(content, dpi):
+				yield label
+
+
+def get_label_documents(service_provider, shipment_id, shipment=None, dpi=DEFAULT_DPI):
+	"""Returns ('zpl', text) or ('pdf', bytes) pairs for the labels of a shipment."""
+	documents = None
+	if service_provider == SENDCLOUD_PROVIDER:
+		parcel_ids = get_provider_parcel_ids(shipment) if shipment else None
+		documents = call_provider(SENDCLOUD_PROVIDER, 'get_label_documents', shipment_id=shipment_id,
+			parcel_ids=parcel_ids, dpi=dpi)
+	elif service_provider == LETMESHIP_PROVIDER:
+		# the PDF comes back as a list of byte values
+		label = call_provider(LETMESHIP_PROVIDER, 'get_label', shipment_id=shipment_id)
+		documents = [('pdf', bytes(bytearray(json.loads(label))))] if label else None
+	elif service_provider == PACKLINK_PROVIDER:
+		urls = call_provider(PACKLINK_PROVIDER, 'get_label', shipment_id=shipment_id)
+		if urls:
+			documents = []
+			for content in run_sync(LabelClient(PACKLINK_PROVIDER).download_all(urls)):
+				if isinstance(content, Exception):
+					raise content
+				documents.append(('pdf', content))
+
+	if not documents:
+		frappe.throw(_('No label found for Shipment (ID: {0}) on {1}').format(shipment_id, service_provider),
+			title=_('Label Not Found'))
+	return documents
+
+
+def get_cached_zpl(pdf_content, dpi=DEFAULT_DPI):
+	# Labels are printed again and again at the dock, convert each PDF only once
+	key = '{0}:{1}:{2}'.format(ZPL_LABEL_KEY, dpi, hashlib.sha1(pdf_content).hexdigest())
+	labels = frappe.cache().get_value(key, expires=True)
+	if labels is None:
+		labels = pdf_to_zpl(pdf_content, dpi)
+		frappe.cache().set_value(key, labels, expires_in_sec=ZPL_LABEL_EXPIRY)
+	return labels
+
+
+def pdf_to_zpl(pdf_content, dpi=DEFAULT_DPI):
+	"""Returns a ZPL label per page of the PDF, rendered at the printer's resolution."""
+	try:
+		import fitz
+		from PIL import Image
+	except ImportError:
+		frappe.throw(_('Please install PyMuPDF and Pillow to print PDF labels as ZPL'), title=_('Missing Dependency'))
+
+	labels = []
+	with fitz.open(stream=pdf_content, filetype='pdf') as pdf:
+		for page in pdf:
+			pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+			image = Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+			labels.append(image_to_zpl(image))
+	return labels
+
+
+def image_to_zpl(image):
+	# Set bits print black in ZPL, so dark pixels become the set bits of a 1-bit image
+	image = image.convert('L').point(lambda value: 255 if value < 128 else 0).convert('1')
+	bytes_per_row = (image.width + 7) // 8
+	data = image.tobytes()
+
+	rows, previous = [], None
+	for i in range(0, len(data), bytes_per_row):
+		row = binascii.hexlify(data[i:i + bytes_per_row]).decode().upper()
+		rows.append(':' if row == previous else compress_row(row))
+		previous = row
+
+	return '^XA^FO0,0^GFA,{0},{0},{1},{2}^FS^XZ\n'.format(len(data), bytes_per_row, ''.join(rows))
+
+
+def compress_row(row):
+	# ZPL run-length compression of a hex row, ',' fills the rest of the row with zeros
+	data = row.rstrip('0')
+	if not data:
+		return ','
+
+	compressed = []
+	for char, group in itertools.groupby(data):
+		count = len(list(group))
+		compressed.append((get_repeat_code(count) if count > 1 else '') + char)
+	return ''.join(compressed) + (',' if len(data) < len(row) else '')
+
+
+def get_repeat_code(count):
+	# G to Y repeat 1 to 19 times, g to z 20 to 400 times in steps of 20
+	code = ''
+	while count > 400:
+		code += 'z'
+		count -= 400
+	if count >= 20:
+		code += chr(ord('g') + count // 20 - 1)
+		count %= 20
+	if count:
+		code += chr(ord('G') + count - 1)
+	return code
+
+
+def send_to_printer(labels, host, port=DEFAULT_PRINTER_PORT):
+	# Raw printing, the printer starts on the first label while the next ones are converted
+	count = 0
+	connection = socket.create_connection((host, port), timeout=PRINTER_TIMEOUT)
+	try:
+		for label in labels:
+			connection.sendall(label.encode())
+			count += 1
+	finally:
+		connection.close()
+	return count
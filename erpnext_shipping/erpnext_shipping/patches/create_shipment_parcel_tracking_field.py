@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+from __future__ import unicode_literals
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+
+def execute():
+	# the Table field needs its child doctype, which is synced after patches run
+	frappe.reload_doc("erpnext_shipping", "doctype", "shipment_parcel_tracking")
+	custom_fields = frappe.get_hooks("shipping_custom_fields")
+	create_custom_fields(custom_fields)
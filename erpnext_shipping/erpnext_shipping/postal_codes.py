@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Local postal code checks, run before any provider is called.
+
+`data/postal_code_formats.json` holds a pattern and an optional normalized format
+per country. Known postal codes can be added per country as `data/postal_codes/<CC>.txt`,
+one code per line in normalized form, sorted bytewise; these files are memory-mapped
+and binary searched, so they are neither loaded nor parsed per request.
+
+The normalized form is only used for these checks, the providers get the postal code
+as it is entered in the Address."""
+from __future__ import unicode_literals
+import os
+import re
+import json
+import mmap
+import frappe
+from frappe import _
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+postal_code_formats = None
+postal_code_indexes = {}
+
+
+def get_postal_code_format(country_code):
+	global postal_code_formats
+	if postal_code_formats is None:
+		with open(os.path.join(DATA_PATH, 'postal_code_formats.json')) as f:
+			postal_code_formats = {country: frappe._dict(pattern=re.compile(d['pattern']), format=d.get('format'))
+				for country, d in json.load(f).items()}
+	return postal_code_formats.get(country_code.upper())
+
+
+def get_postal_code_index(country_code):
+	# Return the memory-mapped list of known postal codes, None if there is none for the country
+	country_code = country_code.upper()
+	if country_code not in postal_code_indexes:
+		path = os.path.join(DATA_PATH, 'postal_codes', '{0}.txt'.format(country_code))
+		index = None
+		if os.path.exists(path) and os.path.getsize(path):
+			with open(path, 'rb') as f:
+				index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		postal_code_indexes[country_code] = index
+	return postal_code_indexes[country_code]
+
+
+def is_known_postal_code(index, postal_code):
+	# Binary search over the sorted, newline separated codes of the index
+	postal_code = postal_code.encode('utf-8')
+	low, high = 0, len(index)
+	while low < high:
+		middle = (low + high) // 2
+		start = index.rfind(b'\n', 0, middle) + 1
+		end = index.find(b'\n', start)
+		if end == -1:
+			end = len(index)
+
+		code = index[start:end].rstrip(b'\r')
+		if code == postal_code:
+			return True
+		elif code < postal_code:
+			low = end + 1
+		else:
+			high = start
+	return False
+
+
+def validate_postal_code(country_code, postal_code):
+	"""Raises if the postal code cannot be valid for the country, returns its normalized form."""
+	postal_code = re.sub(r'\s+', '', postal_code or '').upper()
+	postal_code_format = get_postal_code_format(country_code)
+	if not postal_code_format:
+		return postal_code
+
+	match = postal_code_format.pattern.match(postal_code)
+	if not match:
+		frappe.throw(_('{0} is not a valid postal code for {1}').format(frappe.bold(postal_code), country_code.upper()),
+			title=_('Invalid Postal Code'))
+	if postal_code_format.format:
+		postal_code = postal_code_format.format.format(*match.groups())
+
+	index = get_postal_code_index(country_code)
+	if index is not None and not is_known_postal_code(index, postal_code):
+		frappe.throw(_('Postal code {0} does not exist in {1}').format(frappe.bold(postal_code), country_code.upper()),
+			title=_('Invalid Postal Code'))
+	return postal_code
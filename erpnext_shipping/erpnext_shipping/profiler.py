@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Opt-in profiling of the shipping endpoints, configured in Shipping Settings.
+
+	with shipping_profile('fetch_shipping_rates'):
+		with profile_stage('LetMeShip'):
+			...
+
+Both context managers do nothing unless profiling is enabled for the current user.
+Profiles are queued in Redis and saved by `flush_profile_logs`, so the profile of a
+request that fails and rolls back is kept as well."""
+from __future__ import unicode_literals
+import io
+import json
+import pstats
+import random
+import cProfile
+from time import perf_counter, process_time
+from contextlib import contextmanager
+import frappe
+from frappe.utils import flt, cint, now_datetime, get_datetime
+
+PROFILE_LOG_QUEUE = 'shipping_profile_log'
+PROFILE_LOG_BATCH_SIZE = 100
+
+def is_profiling_enabled():
+	settings = frappe.get_cached_doc('Shipping Settings')
+	if not settings.enable_profiling:
+		return False
+	if settings.profile_user and settings.profile_user != frappe.session.user:
+		return False
+	if settings.profiling_until and get_datetime(settings.profiling_until) < now_datetime():
+		return False
+	return True
+
+
+def get_active_profile():
+	return getattr(frappe.local, 'shipping_profile', None)
+
+
+@contextmanager
+def shipping_profile(method):
+	if get_active_profile() or not is_profiling_enabled():
+		# nested calls are part of the outer profile
+		yield
+		return
+
+	profile = frappe._dict({
+		'method': method,
+		'start': now_datetime(),
+		'query_count': 0,
+		'query_time': 0,
+		'http_timings': {},
+		'stage_timings': {},
+	})
+	sample_rate = flt(frappe.get_cached_doc('Shipping Settings').cprofile_sample_rate)
+	profiler = cProfile.Profile() if random.random() * 100 < sample_rate else None
+
+	original_sql = frappe.db.sql
+	def sql(*args, **kwargs):
+		start = perf_counter()
+		try:
+			return original_sql(*args, **kwargs)
+		finally:
+			profile.query_count += 1
+			profile.query_time += perf_counter() - start
+
+	frappe.local.shipping_profile = profile
+	frappe.db.sql = sql
+	start, cpu_start = perf_counter(), process_time()
+	if profiler:
+		profiler.enable()
+	try:
+		yield
+	finally:
+		if profiler:
+			profiler.disable()
+		duration, cpu_time = perf_counter() - start, process_time() - cpu_start
+		frappe.db.sql = original_sql
+		frappe.local.shipping_profile = None
+		save_profile(profile, duration, cpu_time, profiler)
+
+
+@contextmanager
+def profile_stage(stage):
+	profile = get_active_profile()
+	if not profile:
+		yield
+		return
+
+	start, cpu_start = perf_counter(), process_time()
+	try:
+		yield
+	finally:
+		timings = profile.stage_timings.setdefault(stage, {'count': 0, 'duration': 0, 'cpu_time': 0})
+		timings['count'] += 1
+		timings['duration'] += to_ms(perf_counter() - start)
+		timings['cpu_time'] += to_ms(process_time() - cpu_start)
+
+
+def record_http_time(provider, duration):
+	# Called by the provider clients for every request
+	profile = get_active_profile()
+	if profile:
+		timings = profile.http_timings.setdefault(provider, {'count': 0, 'duration': 0})
+		timings['count'] += 1
+		timings['duration'] += to_ms(duration)
+
+
+def to_ms(seconds):
+	return flt(seconds * 1000, 3)
+
+
+def save_profile(profile, duration, cpu_time, profiler=None):
+	dump = None
+	if profiler:
+		stream = io.StringIO()
+		pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(50)
+		dump = stream.getvalue()
+
+	frappe.cache().rpush(PROFILE_LOG_QUEUE, json.dumps({
+		'method': profile.method,
+		'user': frappe.session.user,
+		'start': str(profile.start),
+		'duration': to_ms(duration),
+		'cpu_time': to_ms(cpu_time),
+		'query_count': cint(profile.query_count),
+		'query_time': to_ms(profile.query_time),
+		'http_time': sum(d['duration'] for d in profile.http_timings.values()),
+		'http_timings': json.dumps(profile.http_timings, indent=1),
+		'stage_timings': json.dumps(profile.stage_timings, indent=1),
+		'profile': dump,
+	}))
+
+
+def flush_profile_logs():
+	# Scheduled event saving the queued profiles as Shipping Profile Logs
+	cache = frappe.cache()
+	while True:
+		batch = cache.lrange(PROFILE_LOG_QUEUE, 0, PROFILE_LOG_BATCH_SIZE - 1)
+		if not batch:
+			break
+
+		for profile in batch:
+			frappe.get_doc(dict(json.loads(profile), doctype='Shipping Profile Log')).insert(ignore_permissions=True)
+		frappe.db.commit()
+		# producers only append, so trimming the head never drops unread profiles
+		cache.ltrim(PROFILE_LOG_QUEUE, len(batch), -1)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Registry of the shipping providers.
+
+Providers are declared in the `shipping_providers` hook, so other apps can add their own:
+
+	shipping_providers = {
+		"LetMeShip": {
+			"settings": "LetMeShip",
+			"utils": "erpnext_shipping.erpnext_shipping.doctype.letmeship.letmeship.LetMeShipUtils"
+		}
+	}
+
+`settings` is a Single doctype with an `enabled` field; providers without one give an
+`is_enabled` method instead. The utils module is only imported when the provider is
+enabled and first used, so disabled providers (and their HTTP clients) are never loaded."""
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+
+LETMESHIP_PROVIDER = 'LetMeShip'
+PACKLINK_PROVIDER = 'Packlink'
+SENDCLOUD_PROVIDER = 'SendCloud'
+RATE_CARD_PROVIDER = 'Rate Card'
+
+
+class ShippingProviderError(frappe.ValidationError):
+	# The provider could not be reached or failed, as opposed to having nothing to report yet
+	pass
+
+
+def get_registered_providers():
+	# frappe.get_hooks returns every value as a list, the last app installed wins
+	providers = {}
+	for provider, config in frappe.get_hooks('shipping_providers').items():
+		providers[provider] = frappe._dict({key: values[-1] for key, values in config.items()})
+	return providers
+
+
+def get_provider_config(provider):
+	config = get_registered_providers().get(provider)
+	if not config:
+		frappe.throw(_('Shipping provider {0} is not registered').format(frappe.bold(provider)))
+	return config
+
+
+def is_provider_enabled(provider):
+	config = get_registered_providers().get(provider)
+	if not config:
+		return False
+	if config.get('is_enabled'):
+		return bool(frappe.get_attr(config.is_enabled)())
+	return bool(frappe.db.get_single_value(config.settings, 'enabled'))
+
+
+def get_enabled_providers():
+	return [provider for provider in get_registered_providers() if is_provider_enabled(provider)]
+
+
+def get_provider(provider):
+	"""Returns a new instance of the utils class of the provider, importing its module on first use."""
+	return frappe.get_attr(get_provider_config(provider).utils)()
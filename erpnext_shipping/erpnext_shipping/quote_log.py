@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+from __future__ import unicode_literals
+import os
+import json
+import frappe
+from six import string_types
+from frappe.utils import flt, cint, now_datetime, getdate, today
+from erpnext_shipping.erpnext_shipping.cartonization import get_chargeable_weight as get_parcel_chargeable_weight
+
+QUOTE_LOG_QUEUE = 'shipping_rate_quote_log'
+QUOTE_LOG_FOLDER = 'shipping_quotes'
+QUOTE_LOG_SEGMENT_PREFIX = 'quotes-'
+QUOTE_LOG_BATCH_SIZE = 500
+QUOTE_LOG_COLUMNS = ['timestamp', 'service_provider', 'carrier', 'carrier_name', 'service_name',
+	'from_country', 'from_zip', 'to_country', 'to_zip', 'chargeable_weight', 'total_price']
+
+
+def log_shipping_rates(shipment_prices, pickup_address, delivery_address, shipment_parcel):
+	# Queue the fetched rates in redis; they are written to disk by `flush_quote_log`
+	if not shipment_prices:
+		return
+
+	timestamp = str(now_datetime())
+	chargeable_weight = get_chargeable_weight(shipment_parcel)
+	quotes = [[
+		timestamp,
+		price.get('service_provider'),
+		price.get('carrier'),
+		price.get('carrier_name'),
+		price.get('service_name'),
+		pickup_address.country_code,
+		pickup_address.pincode,
+		delivery_address.country_code,
+		delivery_address.pincode,
+		chargeable_weight,
+		flt(price.get('total_price')),
+	] for price in shipment_prices if not price.get('is_estimate')]
+	if quotes:
+		frappe.cache().rpush(QUOTE_LOG_QUEUE, json.dumps(quotes))
+
+
+def get_chargeable_weight(shipment_parcel):
+	if isinstance(shipment_parcel, string_types):
+		shipment_parcel = json.loads(shipment_parcel)
+	return sum(get_parcel_chargeable_weight(parcel) * cint(parcel.get('count') or 1) for parcel in shipment_parcel)
+
+
+def get_quote_log_path(*path):
+	return frappe.get_site_path('private', QUOTE_LOG_FOLDER, *path)
+
+
+def flush_quote_log():
+	# Scheduled event appending queued quotes to the segment of the day
+	cache = frappe.cache()
+	if not cache.llen(QUOTE_LOG_QUEUE):
+		return
+
+	frappe.create_folder(get_quote_log_path())
+	segment = get_quote_log_path('{0}{1}.jsonl'.format(QUOTE_LOG_SEGMENT_PREFIX, today()))
+	while True:
+		batch = cache.lrange(QUOTE_LOG_QUEUE, 0, QUOTE_LOG_BATCH_SIZE - 1)
+		if not batch:
+			break
+
+		with open(segment, 'a') as f:
+			for quotes in batch:
+				for quote in json.loads(quotes):
+					f.write(json.dumps(quote) + '\n')
+
+		# producers only append, so trimming the head never drops unread quotes
+		cache.ltrim(QUOTE_LOG_QUEUE, len(batch), -1)
+
+
+def compact_quote_log():
+	# Daily scheduled event converting closed segments into Parquet files.
+	# Segments are kept as JSON lines if pyarrow is not installed.
+	try:
+		import pyarrow
+		import pyarrow.parquet
+	except ImportError:
+		return
+
+	folder = get_quote_log_path()
+	if not os.path.exists(folder):
+		return
+
+	for filename in sorted(os.listdir(folder)):
+		name, extension = os.path.splitext(filename)
+		# the segment of the day is still being appended to
+		if extension != '.jsonl' or get_segment_date(filename) in (None, getdate(today())):
+			continue
+
+		columns = read_segment_columns(os.path.join(folder, filename))
+		table = pyarrow.Table.from_pydict(columns)
+		pyarrow.parquet.write_table(table, os.path.join(folder, name + '.parquet'), compression='zstd')
+		os.remove(os.path.join(folder, filename))
+
+
+def read_segment_columns(path):
+	columns = {column: [] for column in QUOTE_LOG_COLUMNS}
+	with open(path) as f:
+		for line in f:
+			for column, value in zip(QUOTE_LOG_COLUMNS, json.loads(line)):
+				columns[column].append(value)
+	return columns
+
+
+def get_segment_date(filename):
+	# Date of a quotes-<date>.jsonl or .parquet segment, None for any other file in the folder
+	name, extension = os.path.splitext(filename)
+	if extension not in ('.jsonl', '.parquet') or not name.startswith(QUOTE_LOG_SEGMENT_PREFIX):
+		return None
+	try:
+		return getdate(name[len(QUOTE_LOG_SEGMENT_PREFIX):])
+	except (ValueError, OverflowError):
+		return None
+
+
+def iter_logged_quotes(from_date=None):
+	"""Yield logged quotes as dicts, from both compacted and open segments."""
+	folder = get_quote_log_path()
+	if not os.path.exists(folder):
+		return
+
+	from_date = getdate(from_date) if from_date else None
+	for filename in sorted(os.listdir(folder)):
+		name, extension = os.path.splitext(filename)
+		segment_date = get_segment_date(filename)
+		if not segment_date or (from_date and segment_date < from_date):
+			continue
+
+		path = os.path.join(folder, filename)
+		if extension == '.jsonl':
+			with open(path) as f:
+				for line in f:
+					yield frappe._dict(zip(QUOTE_LOG_COLUMNS, json.loads(line)))
+		elif extension == '.parquet':
+			import pyarrow.parquet
+			for row in pyarrow.parquet.read_table(path).to_pylist():
+				yield frappe._dict(row)
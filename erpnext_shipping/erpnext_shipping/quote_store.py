@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Server-side store of the quoted services.
+
+The browser only receives the fields it displays and an opaque quote id per service;
+bookings send back the quote id and the full service, including its price, is read
+from the cache. Quotes are stored with the rates cache key of the Shipment details they
+were priced for, a booking with other addresses or parcels does not get their price."""
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+
+QUOTE_KEY = 'shipping_quotes'
+QUOTE_EXPIRY = 30 * 60
+DISPLAY_FIELDS = ('service_provider', 'carrier', 'service_name', 'total_price', 'is_preferred', 'is_estimate', 'pickup_date')
+
+
+def store_quotes(services, rates_key):
+	"""Store the services under one key and return their display fields with a quote id each."""
+	batch = frappe.generate_hash(length=12)
+	frappe.cache().set_value('{0}:{1}'.format(QUOTE_KEY, batch), {'rates_key': rates_key, 'services': services},
+		expires_in_sec=QUOTE_EXPIRY)
+
+	quotes = []
+	for idx, service in enumerate(services):
+		quote = frappe._dict({field: service.get(field) for field in DISPLAY_FIELDS if service.get(field) is not None})
+		quote.quote_id = '{0}-{1}'.format(batch, idx)
+		quotes.append(quote)
+	return quotes
+
+
+def get_quote(quote_id, rates_key):
+	"""Returns the full service of a quote id, raises if the quote has expired or was priced for other details."""
+	batch, _sep, idx = (quote_id or '').rpartition('-')
+	quotes = frappe.cache().get_value('{0}:{1}'.format(QUOTE_KEY, batch), expires=True) if batch else None
+	services = quotes.get('services') if quotes else None
+	if not services or not idx.isdigit() or int(idx) >= len(services):
+		frappe.throw(_('The selected rate has expired. Please fetch the shipping rates again.'), title=_('Rate Expired'))
+	if quotes.get('rates_key') != rates_key:
+		frappe.throw(_('The selected rate was quoted for other addresses or parcels. Please fetch the shipping rates again.'),
+			title=_('Rate Changed'))
+	return frappe._dict(services[int(idx)])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+from __future__ import unicode_literals
+import os
+import json
+from bisect import bisect_left
+from collections import defaultdict
+import frappe
+from frappe.utils import flt, add_days, today
+from erpnext_shipping.erpnext_shipping.quote_log import get_chargeable_weight, iter_logged_quotes
+
+RATE_ESTIMATES_KEY = 'shipping_rate_estimates'
+# kept next to, not in, the quote log folder, which only holds its segments
+RATE_ESTIMATES_FILE = 'shipping_rate_estimates.json'
+RATE_ESTIMATES_HISTORY_DAYS = 90
+# upper bounds in kg, the last band takes everything heavier
+WEIGHT_BANDS = [0.5, 1, 2, 3, 5, 10, 15, 20, 31.5, 40, 50, 70]
+ESTIMATE_FIELDS = ['service_provider', 'carrier', 'carrier_name', 'service_name']
+
+
+def get_weight_band(weight):
+	return bisect_left(WEIGHT_BANDS, flt(weight))
+
+
+def build_rate_estimates():
+	# Daily scheduled event building the estimate table from the quote history.
+	# Prices are grouped by route, weight band and service; the median is kept.
+	prices = defaultdict(list)
+	for quote in iter_logged_quotes(from_date=add_days(today(), -RATE_ESTIMATES_HISTORY_DAYS)):
+		key = (quote.from_country, quote.to_country, get_weight_band(quote.chargeable_weight))
+		service = tuple(quote.get(field) or '' for field in ESTIMATE_FIELDS)
+		prices[key + service].append(flt(quote.total_price))
+
+	estimates = defaultdict(list)
+	for key, service_prices in prices.items():
+		service_prices.sort()
+		route = '{0}:{1}:{2}'.format(*key[:3])
+		estimates[route].append(list(key[3:]) + [service_prices[len(service_prices) // 2], len(service_prices)])
+
+	with open(get_rate_estimates_path(), 'w') as f:
+		json.dump(estimates, f)
+	frappe.cache().delete_value(RATE_ESTIMATES_KEY)
+
+
+def get_rate_estimates_path():
+	return frappe.get_site_path('private', RATE_ESTIMATES_FILE)
+
+
+def load_rate_estimates():
+	path = get_rate_estimates_path()
+	if not os.path.exists(path):
+		return {}
+	with open(path) as f:
+		return json.load(f)
+
+
+def get_estimated_rates(service_provider, pickup_address, delivery_address, shipment_parcel):
+	"""Returns estimated services of a provider for the route and weight, flagged with `is_estimate`."""
+	estimates = frappe.cache().get_value(RATE_ESTIMATES_KEY, generator=load_rate_estimates)
+	route = '{0}:{1}:{2}'.format(pickup_address.country_code, delivery_address.country_code,
+		get_weight_band(get_chargeable_weight(shipment_parcel)))
+
+	estimated_rates = []
+	for estimate in estimates.get(route, []):
+		if estimate[0] != service_provider:
+			continue
+		service = frappe._dict(zip(ESTIMATE_FIELDS, estimate))
+		service.total_price = estimate[4]
+		service.quote_count = estimate[5]
+		service.is_preferred = frappe.db.get_value('Parcel Service Type', service.service_name,
+			'show_in_preferred_services_list') or 0
+		service.is_estimate = 1
+		estimated_rates.append(service)
+	return estimated_rates
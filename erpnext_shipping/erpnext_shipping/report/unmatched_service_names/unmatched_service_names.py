@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.utils import add_days, today
+from erpnext_shipping.erpnext_shipping.quote_log import iter_logged_quotes
+from erpnext_shipping.erpnext_shipping.providers import LETMESHIP_PROVIDER, PACKLINK_PROVIDER
+
+# services of these providers are matched to Parcel Service Types by their aliases
+MATCHED_PROVIDERS = (LETMESHIP_PROVIDER, PACKLINK_PROVIDER)
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	return get_columns(), get_data(filters.from_date or add_days(today(), -30))
+
+def get_columns():
+	# Exported with these labels, the report can be filled in and imported as a service catalogue
+	return [
+		{'fieldname': 'parcel_service', 'label': _('Parcel Service'), 'fieldtype': 'Data', 'width': 150},
+		{'fieldname': 'alias', 'label': _('Alias'), 'fieldtype': 'Data', 'width': 250},
+		{'fieldname': 'parcel_service_type', 'label': _('Parcel Service Type'), 'fieldtype': 'Data', 'width': 200},
+		{'fieldname': 'service_provider', 'label': _('Service Provider'), 'fieldtype': 'Data', 'width': 120},
+		{'fieldname': 'quotes', 'label': _('Quotes'), 'fieldtype': 'Int', 'width': 90},
+		{'fieldname': 'last_quoted', 'label': _('Last Quoted'), 'fieldtype': 'Datetime', 'width': 160},
+	]
+
+def get_data(from_date):
+	service_types = {d.name for d in frappe.get_all('Parcel Service Type')}
+
+	unmatched = {}
+	for quote in iter_logged_quotes(from_date=from_date):
+		if quote.service_provider not in MATCHED_PROVIDERS or quote.service_name in service_types:
+			continue
+
+		# the aliases of LetMeShip services are looked up the other way round, see `get_shipping_rates`
+		if quote.service_provider == LETMESHIP_PROVIDER:
+			parcel_service, alias = quote.carrier_name, quote.carrier
+		else:
+			parcel_service, alias = quote.carrier, quote.carrier_name
+
+		key = (quote.service_provider, parcel_service, alias)
+		if key not in unmatched:
+			unmatched[key] = frappe._dict({
+				'parcel_service': parcel_service,
+				'alias': alias,
+				'parcel_service_type': '',
+				'service_provider': quote.service_provider,
+				'quotes': 0,
+			})
+		unmatched[key].quotes += 1
+		unmatched[key].last_quoted = max(unmatched[key].last_quoted or '', str(quote.timestamp))
+
+	return sorted(unmatched.values(), key=lambda d: d.quotes, reverse=True)
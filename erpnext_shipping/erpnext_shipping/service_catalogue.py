@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Bulk upsert of Parcel Services, Parcel Service Types and their aliases.
+
+Rows come from a CSV file or a provider's service catalogue. Existing records are
+read once, then new records, changed fields and new alias rows are written with a
+few batched statements instead of a document save per record."""
+from __future__ import unicode_literals
+import json
+from collections import defaultdict
+import frappe
+from six import string_types
+from frappe import _
+from frappe.utils import cint, now_datetime, scrub
+from frappe.utils.csvutils import read_csv_content
+from erpnext_shipping.erpnext_shipping.providers import SENDCLOUD_PROVIDER, get_provider
+
+BATCH_SIZE = 1000
+# several aliases of one service type are separated by semicolons
+ALIAS_SEPARATOR = ';'
+
+
+@frappe.whitelist()
+def import_service_catalogue(file_url=None, service_provider=None):
+	"""Upserts the catalogue of a CSV File or of a provider, returns the number of inserted and updated records."""
+	frappe.only_for('System Manager')
+	if file_url:
+		rows = get_csv_rows(frappe.get_doc('File', {'file_url': file_url}).get_content())
+	elif service_provider == SENDCLOUD_PROVIDER:
+		rows = get_provider(SENDCLOUD_PROVIDER).get_service_catalogue()
+	else:
+		frappe.throw(_('Please attach a CSV file, {0} is the only provider with a service catalogue')
+			.format(SENDCLOUD_PROVIDER))
+	return upsert_service_catalogue(rows)
+
+
+def get_csv_rows(content):
+	# Columns by label or fieldname: Parcel Service, Parcel Service Type, Alias, Description and
+	# Show in Preferred Services List
+	rows = read_csv_content(content)
+	if not rows:
+		return []
+
+	header = [scrub(column or '') for column in rows[0]]
+	header = ['alias' if column == 'parcel_type_alias' else column for column in header]
+	missing = [field for field in ('parcel_service', 'parcel_service_type') if field not in header]
+	if missing:
+		frappe.throw(_('Columns {0} are missing in the CSV file').format(', '.join(missing)))
+	return [frappe._dict(zip(header, row)) for row in rows[1:] if any(row)]
+
+
+def upsert_service_catalogue(rows):
+	if isinstance(rows, string_types):
+		rows = json.loads(rows)
+
+	services = {d.name for d in frappe.get_all('Parcel Service')}
+	service_types = {d.name: d for d in frappe.get_all('Parcel Service Type',
+		fields=['name', 'description', 'show_in_preferred_services_list'])}
+	aliases = defaultdict(set)
+	idx = defaultdict(int)
+	for alias in frappe.get_all('Parcel Service Type Alias', fields=['parent', 'parcel_service', 'parcel_type_alias', 'idx']):
+		aliases[alias.parent].add((alias.parcel_service, alias.parcel_type_alias))
+		idx[alias.parent] = max(idx[alias.parent], cint(alias.idx))
+
+	new_services, new_service_types, new_aliases = [], [], []
+	updates = defaultdict(dict)
+	for row in rows:
+		row = frappe._dict(row)
+		parcel_service = (row.parcel_service or '').strip()
+		parcel_service_type = (row.parcel_service_type or '').strip()
+		if not parcel_service or not parcel_service_type:
+			continue
+
+		if parcel_service not in services:
+			services.add(parcel_service)
+			new_services.append(parcel_service)
+
+		name = '{0} - {1}'.format(parcel_service, parcel_service_type)
+		preferred = cint(row.show_in_preferred_services_list)
+		existing = service_types.get(name)
+		if not existing:
+			existing = service_types[name] = frappe._dict({
+				'name': name,
+				'description': row.description,
+				'show_in_preferred_services_list': preferred,
+			})
+			new_service_types.append((name, parcel_service, parcel_service_type, row.description, preferred))
+		else:
+			if row.description and row.description != existing.description:
+				updates['description'][name] = existing.description = row.description
+			if row.show_in_preferred_services_list not in (None, '') and preferred != cint(existing.show_in_preferred_services_list):
+				updates['show_in_preferred_services_list'][name] = existing.show_in_preferred_services_list = preferred
+
+		for alias in (row.alias or '').split(ALIAS_SEPARATOR):
+			alias = alias.strip()
+			if alias and (parcel_service, alias) not in aliases[name]:
+				aliases[name].add((parcel_service, alias))
+				idx[name] += 1
+				new_aliases.append((name, idx[name], parcel_service, alias))
+
+	insert_records(new_services, new_service_types, new_aliases)
+	for field, values in updates.items():
+		update_field('Parcel Service Type', field, values)
+	touch_service_types({alias[0] for alias in new_aliases} - {d[0] for d in new_service_types})
+
+	return {
+		'parcel_services': len(new_services),
+		'parcel_service_types': len(new_service_types),
+		'aliases': len(new_aliases),
+		'updated': len({name for values in updates.values() for name in values}),
+	}
+
+
+def insert_records(new_services, new_service_types, new_aliases):
+	now, user = now_datetime(), frappe.session.user
+	standard_fields = ['creation', 'modified', 'owner', 'modified_by', 'docstatus']
+	standard_values = (now, now, user, user, 0)
+
+	frappe.db.bulk_insert('Parcel Service', ['name', 'parcel_service_name'] + standard_fields,
+		[(name, name) + standard_values for name in new_services])
+	frappe.db.bulk_insert('Parcel Service Type',
+		['name', 'parcel_service', 'parcel_service_type', 'description', 'show_in_preferred_services_list'] + standard_fields,
+		[values + standard_values for values in new_service_types])
+	frappe.db.bulk_insert('Parcel Service Type Alias',
+		['name', 'parent', 'parenttype', 'parentfield', 'idx', 'parcel_service', 'parcel_type_alias'] + standard_fields,
+		[(frappe.generate_hash(length=10), parent, 'Parcel Service Type', 'parcel_service_type_alias', row_idx,
+			parcel_service, alias) + standard_values for parent, row_idx, parcel_service, alias in new_aliases])
+
+
+def update_field(doctype, field, values):
+	# One statement per distinct value and batch of names
+	names_by_value = defaultdict(list)
+	for name, value in values.items():
+		names_by_value[value].append(name)
+
+	for value, names in names_by_value.items():
+		for i in range(0, len(names), BATCH_SIZE):
+			frappe.db.sql("""update `tab{0}` set `{1}` = %s, modified = %s where name in %s""".format(doctype, field),
+				(value, now_datetime(), tuple(names[i:i + BATCH_SIZE])))
+
+
+def touch_service_types(names):
+	# Existing Parcel Service Types that got new aliases
+	names = list(names)
+	for i in range(0, len(names), BATCH_SIZE):
+		frappe.db.sql("""update `tabParcel Service Type` set modified = %s where name in %s""",
+			(now_datetime(), tuple(names[i:i + BATCH_SIZE])))
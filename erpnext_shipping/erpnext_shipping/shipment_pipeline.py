@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Automatic shipping of submitted Delivery Notes.
+
+Every Delivery Note runs through a chain of background stages: build the Shipment,
+propose its parcels, submit it and book the service selected by the Shipping Service
+Rules. Each stage commits and enqueues the next one; a failing stage stops the chain
+and leaves the Shipment where it is for manual handling. At most
+`auto_shipment_max_in_flight` Delivery Notes are in the pipeline at once, further
+ones wait in a Redis list until a slot is free. Slots are only taken by a job queued
+after the submit committed, so a rolled back submit never holds one."""
+from __future__ import unicode_literals
+import time
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, nowdate
+from erpnext_shipping.erpnext_shipping.utils import show_error_alert
+
+IN_FLIGHT_KEY = 'shipment_pipeline_in_flight'
+DEFERRED_KEY = 'shipment_pipeline_deferred'
+METRICS_KEY = 'shipment_pipeline_metrics'
+DEFAULT_MAX_IN_FLIGHT = 20
+# Delivery Notes in flight for longer than this were lost with their worker and free their slot
+STALE_SECONDS = 30 * 60
+
+# takes a slot for ARGV[3] unless the pipeline is full, after dropping the stale slots
+ACQUIRE_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], 0, ARGV[1] - ARGV[4])
+if redis.call('zcard', KEYS[1]) >= tonumber(ARGV[2]) then
+	return 0
+end
+redis.call('zadd', KEYS[1], ARGV[1], ARGV[3])
+return 1
+"""
+
+
+def start_shipment_pipeline(doc, method=None):
+	# Delivery Note on_submit hook
+	settings = frappe.get_cached_doc('Shipping Settings')
+	if not cint(settings.enable_auto_shipment) or doc.is_return:
+		return
+	if frappe.db.exists('Shipment Delivery Note', {'delivery_note': doc.name, 'docstatus': ('<', 2)}):
+		return
+
+	frappe.enqueue('erpnext_shipping.erpnext_shipping.shipment_pipeline.admit_delivery_note', queue='long',
+		enqueue_after_commit=True, delivery_note=doc.name)
+
+
+def admit_delivery_note(delivery_note):
+	# Run the first stage right away if the pipeline has a free slot, defer the Delivery Note otherwise
+	if acquire_slot(delivery_note):
+		run_stage(0, delivery_note)
+	else:
+		# the list methods of the cache prefix the key with the site themselves
+		frappe.cache().rpush(DEFERRED_KEY, delivery_note)
+		incr_metric('deferred')
+
+
+def start_deferred_pipelines():
+	# Scheduled: move deferred Delivery Notes into the pipeline as slots free up
+	while frappe.cache().llen(DEFERRED_KEY):
+		delivery_note = frappe.cache().lpop(DEFERRED_KEY)
+		if not delivery_note:
+			break
+
+		delivery_note = frappe.safe_decode(delivery_note)
+		if not acquire_slot(delivery_note):
+			frappe.cache().lpush(DEFERRED_KEY, delivery_note)
+			break
+		enqueue_stage(0, delivery_note)
+	frappe.db.commit()
+
+
+def acquire_slot(delivery_note):
+	max_in_flight = cint(frappe.get_cached_doc('Shipping Settings').auto_shipment_max_in_flight) or DEFAULT_MAX_IN_FLIGHT
+	cache = frappe.cache()
+	return cint(cache.eval(ACQUIRE_SCRIPT, 1, cache.make_key(IN_FLIGHT_KEY),
+		time.time(), max_in_flight, delivery_note, STALE_SECONDS))
+
+
+def release_slot(delivery_note):
+	frappe.cache().zrem(frappe.cache().make_key(IN_FLIGHT_KEY), delivery_note)
+
+
+def get_stages():
+	return (
+		('Build Shipment', build_shipment),
+		('Propose Parcels', propose_parcels),
+		('Submit Shipment', submit_shipment),
+		('Book Shipment', book_shipment),
+	)
+
+
+def enqueue_stage(stage, delivery_note, shipment=None):
+	frappe.enqueue('erpnext_shipping.erpnext_shipping.shipment_pipeline.run_stage', queue='long',
+		enqueue_after_commit=True, stage=stage, delivery_note=delivery_note, shipment=shipment)
+
+
+def run_stage(stage, delivery_note, shipment=None):
+	stages = get_stages()
+	label, method = stages[stage]
+	start = time.time()
+	try:
+		shipment = method(delivery_note, shipment)
+	except Exception:
+		frappe.db.rollback()
+		record_stage(label, time.time() - start, failed=True)
+		release_slot(delivery_note)
+		show_error_alert('shipping Delivery Note {0} automatically ({1})'.format(delivery_note, label))
+		frappe.db.commit()
+		return
+
+	record_stage(label, time.time() - start)
+	if shipment and stage + 1 < len(stages):
+		enqueue_stage(stage + 1, delivery_note, shipment)
+	else:
+		release_slot(delivery_note)
+	frappe.db.commit()
+
+
+def build_shipment(delivery_note, shipment=None):
+	# ERPNext maps the addresses, contacts and value of goods of the Delivery Note
+	from erpnext.stock.doctype.delivery_note.delivery_note import make_shipment
+
+	settings = frappe.get_cached_doc('Shipping Settings')
+	doc = make_shipment(delivery_note)
+	doc.pickup_date = nowdate()
+	doc.description_of_content = doc.description_of_content or settings.auto_shipment_description
+	if settings.auto_shipment_pickup_contact:
+		doc.pickup_contact_person = settings.auto_shipment_pickup_contact
+	doc.insert(ignore_permissions=True)
+	return doc.name
+
+
+def propose_parcels(delivery_note, shipment):
+	from erpnext_shipping.erpnext_shipping.cartonization import get_proposed_parcels
+
+	doc = frappe.get_doc('Shipment', shipment)
+	doc.set('shipment_parcel', [])
+	for parcel in get_proposed_parcels([delivery_note]):
+		doc.append('shipment_parcel', {
+			'length': parcel.length,
+			'width': parcel.width,
+			'height': parcel.height,
+			'weight': parcel.weight,
+			'count': parcel.count,
+		})
+	doc.save(ignore_permissions=True)
+	return doc.name
+
+
+def submit_shipment(delivery_note, shipment):
+	doc = frappe.get_doc('Shipment', shipment)
+	doc.submit()
+	return doc.name
+
+
+def book_shipment(delivery_note, shipment):
+	from erpnext_shipping.erpnext_shipping.shipping import auto_book_shipment
+
+	doc = frappe.get_doc('Shipment', shipment)
+	# a provider failing to book raises with its own message
+	if not auto_book_shipment(doc):
+		frappe.throw(_('No service matches the Shipping Service Rules'))
+	return doc.name
+
+
+def record_stage(label, seconds, failed=False):
+	# Raw commands through a pipeline, the hash methods of the cache pickle their values
+	cache = frappe.cache()
+	key = cache.make_key(METRICS_KEY)
+	pipeline = cache.pipeline()
+	pipeline.hincrby(key, '{0}:count'.format(label), 1)
+	pipeline.hincrbyfloat(key, '{0}:seconds'.format(label), seconds)
+	if failed:
+		pipeline.hincrby(key, '{0}:failed'.format(label), 1)
+	pipeline.execute()
+
+
+def incr_metric(name):
+	frappe.cache().hincrby(frappe.cache().make_key(METRICS_KEY), name, 1)
+
+
+@frappe.whitelist()
+def get_pipeline_metrics():
+	"""Returns runs, failures and average duration per stage and the Delivery Notes in flight and deferred."""
+	frappe.only_for('System Manager')
+	cache = frappe.cache()
+	pipeline = cache.pipeline()
+	pipeline.hgetall(cache.make_key(METRICS_KEY))
+	pipeline.zcard(cache.make_key(IN_FLIGHT_KEY))
+	metrics, in_flight = pipeline.execute()
+	values = {frappe.safe_decode(key): flt(value) for key, value in (metrics or {}).items()}
+
+	stages = []
+	for label, method in get_stages():
+		count = cint(values.get('{0}:count'.format(label)))
+		stages.append({
+			'stage': label,
+			'count': count,
+			'failed': cint(values.get('{0}:failed'.format(label))),
+			'average_seconds': flt(values.get('{0}:seconds'.format(label)) / count, 3) if count else 0,
+		})
+
+	return {
+		'stages': stages,
+		'in_flight': in_flight,
+		'deferred': cache.llen(DEFERRED_KEY),
+		'deferred_total': cint(values.get('deferred')),
+	}
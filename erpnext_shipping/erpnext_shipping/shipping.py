@@ -6,84 +6,279 @@ import frappe
 import json
 from six import string_types
 from frappe import _
-from frappe.utils import flt
-from erpnext.stock.doctype.shipment.shipment import get_company_contact
-from erpnext_shipping.erpnext_shipping.utils import get_address, get_contact, match_parcel_service_type_carrier
-from erpnext_shipping.erpnext_shipping.doctype.letmeship.letmeship import LETMESHIP_PROVIDER, LetMeShipUtils
-from erpnext_shipping.erpnext_shipping.doctype.packlink.packlink import PACKLINK_PROVIDER, PackLinkUtils
-from erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud import SENDCLOUD_PROVIDER, SendCloudUtils
+from frappe.utils import flt, cint
+from erpnext_shipping.erpnext_shipping.utils import get_address, get_contact, get_fingerprint, match_parcel_service_type_carrier, \
+	show_error_alert
+from erpnext_shipping.erpnext_shipping.quote_log import log_shipping_rates, get_chargeable_weight
+from erpnext_shipping.erpnext_shipping.rate_estimation import get_estimated_rates
+from erpnext_shipping.erpnext_shipping.validation import validate_shipment_payload
+from erpnext_shipping.erpnext_shipping.profiler import shipping_profile, profile_stage
+from erpnext_shipping.erpnext_shipping.singleflight import single_flight
+from erpnext_shipping.erpnext_shipping.quote_store import store_quotes, get_quote
+from erpnext_shipping.erpnext_shipping.providers import LETMESHIP_PROVIDER, PACKLINK_PROVIDER, SENDCLOUD_PROVIDER, \
+	RATE_CARD_PROVIDER, ShippingProviderError, get_provider, is_provider_enabled
+from erpnext_shipping.erpnext_shipping.doctype.shipping_retry_job.shipping_retry_job import UPDATE_TRACKING, enqueue_retry
+from erpnext_shipping.erpnext_shipping.doctype.shipping_service_rule.shipping_service_rule import get_compiled_rules, \
+	get_rule_context, select_service
+from erpnext_shipping.erpnext_shipping.doctype.shipment_tracking_event.shipment_tracking_event import TRACKING_FIELDS, record_tracking_event
+from erpnext_shipping.erpnext_shipping.doctype.shipment_parcel_tracking.shipment_parcel_tracking import get_parcels, get_provider_parcel_ids, update_parcel_tracking
+
+SHIPPING_RATES_EXPIRY = 15 * 60
+TRACKING_PROVIDERS = (LETMESHIP_PROVIDER, PACKLINK_PROVIDER, SENDCLOUD_PROVIDER)
 
 @frappe.whitelist()
 def fetch_shipping_rates(pickup_from_type, delivery_to_type, pickup_address_name, delivery_address_name,
+	shipment_parcel, description_of_content, pickup_date, value_of_goods,
+	pickup_contact_name=None, delivery_contact_name=None):
+	# Return Shipping Rates for the various Shipping Providers,
+	# served from the rates prefetched on submit while they are fresh
+	rate_args = get_rate_args(pickup_from_type, delivery_to_type, pickup_address_name, delivery_address_name,
+		shipment_parcel, description_of_content, pickup_date, value_of_goods, pickup_contact_name, delivery_contact_name)
+	with shipping_profile('fetch_shipping_rates'):
+		shipment_prices = get_cached_shipping_rates(rate_args)
+	# the full services stay on the server, booking refers to them by quote id
+	return store_quotes(shipment_prices, get_shipping_rates_cache_key(rate_args))
+
+def get_rate_args(pickup_from_type, delivery_to_type, pickup_address_name, delivery_address_name,
+	shipment_parcel, description_of_content, pickup_date, value_of_goods,
+	pickup_contact_name=None, delivery_contact_name=None):
+	return frappe._dict({
+		'pickup_from_type': pickup_from_type,
+		'delivery_to_type': delivery_to_type,
+		'pickup_address_name': pickup_address_name,
+		'delivery_address_name': delivery_address_name,
+		'shipment_parcel': shipment_parcel,
+		'description_of_content': description_of_content,
+		'pickup_date': pickup_date,
+		'value_of_goods': value_of_goods,
+		'pickup_contact_name': pickup_contact_name,
+		'delivery_contact_name': delivery_contact_name,
+	})
+
+def get_cached_shipping_rates(rate_args):
+	cache_key = get_shipping_rates_cache_key(rate_args)
+	shipment_prices = frappe.cache().get_value(cache_key, expires=True)
+	if shipment_prices is None:
+		shipment_prices = get_shipping_rates(**rate_args)
+		cache_shipping_rates(cache_key, shipment_prices)
+	return shipment_prices
+
+def cache_shipping_rates(cache_key, shipment_prices):
+	# Empty results and estimates stand in for a failed provider, they are not shared with other requests
+	if shipment_prices and not any(price.get('is_estimate') for price in shipment_prices):
+		frappe.cache().set_value(cache_key, shipment_prices, expires_in_sec=SHIPPING_RATES_EXPIRY)
+
+def prefetch_shipping_rates(doc, method=None):
+	# Shipment on_submit hook, fetch the rates in the background before the user asks for them
+	frappe.enqueue('erpnext_shipping.erpnext_shipping.shipping.prefetch_shipping_rates_job',
+		queue='short', enqueue_after_commit=True, rate_args=get_shipment_rate_args(doc))
+
+def get_shipment_rate_args(doc):
+	return frappe._dict({
+		'pickup_from_type': doc.pickup_from_type,
+		'delivery_to_type': doc.delivery_to_type,
+		'pickup_address_name': doc.pickup_address_name,
+		'delivery_address_name': doc.delivery_address_name,
+		'shipment_parcel': json.dumps([parcel.as_dict() for parcel in doc.shipment_parcel], default=str),
+		'description_of_content': doc.description_of_content,
+		'pickup_date': str(doc.pickup_date),
+		'value_of_goods': doc.value_of_goods,
+		'pickup_contact_name': doc.pickup_contact_person if doc.pickup_from_type == 'Company' else doc.pickup_contact_name,
+		'delivery_contact_name': doc.delivery_contact_name,
+	})
+
+def prefetch_shipping_rates_job(rate_args):
+	rate_args = frappe._dict(rate_args)
+	cache_shipping_rates(get_shipping_rates_cache_key(rate_args), get_shipping_rates(**rate_args))
+
+def get_shipping_rates_cache_key(rate_args):
+	# Parcel rows sent by the form carry row metadata, only their dimensions identify the rates
+	shipment_parcel = rate_args.shipment_parcel
+	if isinstance(shipment_parcel, string_types):
+		shipment_parcel = json.loads(shipment_parcel)
+
+	return 'shipping_rates|' + get_fingerprint({
+		'pickup_from_type': rate_args.pickup_from_type,
+		'delivery_to_type': rate_args.delivery_to_type,
+		'pickup_address_name': rate_args.pickup_address_name,
+		'delivery_address_name': rate_args.delivery_address_name,
+		'shipment_parcel': [[flt(parcel.get(field)) for field in ('length', 'width', 'height', 'weight', 'count')]
+			for parcel in shipment_parcel],
+		'description_of_content': rate_args.description_of_content,
+		'pickup_date': str(rate_args.pickup_date),
+		'value_of_goods': flt(rate_args.value_of_goods),
+		'pickup_contact_name': rate_args.pickup_contact_name,
+		'delivery_contact_name': rate_args.delivery_contact_name,
+	})
+
+def get_shipping_rates(pickup_from_type, delivery_to_type, pickup_address_name, delivery_address_name,
 	shipment_parcel, description_of_content, pickup_date, value_of_goods,
 	pickup_contact_name=None, delivery_contact_name=None):
 	# Return Shipping Rates for the various Shipping Providers
 	shipment_prices = []
-	letmeship_enabled = frappe.db.get_single_value('LetMeShip','enabled')
-	packlink_enabled = frappe.db.get_single_value('Packlink','enabled')
-	sendcloud_enabled = frappe.db.get_single_value('SendCloud','enabled')
+	letmeship_enabled = is_provider_enabled(LETMESHIP_PROVIDER)
+	packlink_enabled = is_provider_enabled(PACKLINK_PROVIDER)
+	sendcloud_enabled = is_provider_enabled(SENDCLOUD_PROVIDER)
 	pickup_address = get_address(pickup_address_name)
 	delivery_address = get_address(delivery_address_name)
+	pickup_contact = None
+	delivery_contact = None
+
+	if letmeship_enabled:
+		pickup_contact, delivery_contact = get_shipment_contacts(pickup_from_type, delivery_to_type,
+			pickup_contact_name, delivery_contact_name)
+
+	service_providers = [provider for provider, enabled in (
+		(LETMESHIP_PROVIDER, letmeship_enabled),
+		(PACKLINK_PROVIDER, packlink_enabled),
+		(SENDCLOUD_PROVIDER, sendcloud_enabled and pickup_from_type == 'Company'),
+	) if enabled]
+	validate_shipment_payload(service_providers, shipment_parcel, pickup_address, delivery_address,
+		pickup_contact, delivery_contact)
 
 	if letmeship_enabled:
-		pickup_contact = None
-		delivery_contact = None
-		if pickup_from_type != 'Company':
-			pickup_contact = get_contact(pickup_contact_name)
-		else:
-			pickup_contact = get_company_contact(user=pickup_contact_name)
-
-		if delivery_to_type != 'Company':
-			delivery_contact = get_contact(delivery_contact_name)
-		else:
-			delivery_contact = get_company_contact(user=pickup_contact_name)
-
-		letmeship = LetMeShipUtils()
-		letmeship_prices = letmeship.get_available_services(
-			delivery_to_type=delivery_to_type,
-			pickup_address=pickup_address,
-			delivery_address=delivery_address,
-			shipment_parcel=shipment_parcel,
-			description_of_content=description_of_content,
-			pickup_date=pickup_date,
-			value_of_goods=value_of_goods,
-			pickup_contact=pickup_contact,
-			delivery_contact=delivery_contact,
-		) or []
-		letmeship_prices = match_parcel_service_type_carrier(letmeship_prices, ['carrier', 'carrier_name'])
-		shipment_prices = shipment_prices + letmeship_prices
+		with profile_stage(LETMESHIP_PROVIDER):
+			letmeship_prices = call_provider(LETMESHIP_PROVIDER, 'get_available_services',
+				delivery_to_type=delivery_to_type,
+				pickup_address=pickup_address,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel,
+				description_of_content=description_of_content,
+				pickup_date=pickup_date,
+				value_of_goods=value_of_goods,
+				pickup_contact=pickup_contact,
+				delivery_contact=delivery_contact,
+			) or []
+			letmeship_prices = match_parcel_service_type_carrier(letmeship_prices, ['carrier', 'carrier_name'])
+			# fall back to prices estimated from the quote history if the provider returned nothing
+			letmeship_prices = letmeship_prices or get_estimated_rates(LETMESHIP_PROVIDER, pickup_address, delivery_address, shipment_parcel)
+			shipment_prices = shipment_prices + letmeship_prices
 
 	if packlink_enabled:
-		packlink = PackLinkUtils()
-		packlink_prices = packlink.get_available_services(
-			pickup_address=pickup_address,
-			delivery_address=delivery_address,
-			shipment_parcel=shipment_parcel,
-			pickup_date=pickup_date
-		) or []
-		packlink_prices = match_parcel_service_type_carrier(packlink_prices, ['carrier_name', 'carrier'])
-		shipment_prices = shipment_prices + packlink_prices
+		with profile_stage(PACKLINK_PROVIDER):
+			packlink_prices = call_provider(PACKLINK_PROVIDER, 'get_available_services',
+				pickup_address=pickup_address,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel,
+				pickup_date=pickup_date
+			) or []
+			packlink_prices = match_parcel_service_type_carrier(packlink_prices, ['carrier_name', 'carrier'])
+			packlink_prices = packlink_prices or get_estimated_rates(PACKLINK_PROVIDER, pickup_address, delivery_address, shipment_parcel)
+			shipment_prices = shipment_prices + packlink_prices
 
 	if sendcloud_enabled and pickup_from_type == 'Company':
-		sendcloud = SendCloudUtils()
-		sendcloud_prices = sendcloud.get_available_services(
-			delivery_address=delivery_address,
-			shipment_parcel=shipment_parcel
-		) or []
-		shipment_prices = shipment_prices + sendcloud_prices
+		with profile_stage(SENDCLOUD_PROVIDER):
+			sendcloud_prices = call_provider(SENDCLOUD_PROVIDER, 'get_available_services',
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel
+			) or []
+			sendcloud_prices = sendcloud_prices or get_estimated_rates(SENDCLOUD_PROVIDER, pickup_address, delivery_address, shipment_parcel)
+			shipment_prices = shipment_prices + sendcloud_prices
+
+	if is_provider_enabled(RATE_CARD_PROVIDER):
+		with profile_stage(RATE_CARD_PROVIDER):
+			rate_card = get_provider(RATE_CARD_PROVIDER)
+			rate_card_prices = rate_card.get_available_services(
+				pickup_address=pickup_address,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel
+			)
+			shipment_prices = shipment_prices + rate_card_prices
 	shipment_prices = sorted(shipment_prices, key=lambda k:k['total_price'])
+	log_shipping_rates(shipment_prices, pickup_address, delivery_address, shipment_parcel)
 	return shipment_prices
 
 @frappe.whitelist()
-def create_shipment(shipment, pickup_from_type, delivery_to_type, pickup_address_name,
-		delivery_address_name, shipment_parcel, description_of_content, pickup_date,
-		value_of_goods, service_data, shipment_notific_email=None, tracking_notific_email=None,
-		pickup_contact_name=None, delivery_contact_name=None, delivery_notes=[]):
-	# Create Shipment for the selected provider
-	service_info = json.loads(service_data)
-	shipment_info, pickup_contact,  delivery_contact = None, None, None
-	pickup_address = get_address(pickup_address_name)
-	delivery_address = get_address(delivery_address_name)
+def fetch_packlink_rates_by_date(pickup_address_name, delivery_address_name, shipment_parcel, pickup_date, days=7,
+	pickup_from_type=None, delivery_to_type=None, description_of_content=None, value_of_goods=None,
+	pickup_contact_name=None, delivery_contact_name=None):
+	# Return the Packlink rates per pickup date, so that the pickup date can be switched without quoting again.
+	# The quotes are bound to the Shipment details, the booked collection date comes with the quote.
+	if not is_provider_enabled(PACKLINK_PROVIDER):
+		return {}
+
+	rates_key = get_shipping_rates_cache_key(get_rate_args(pickup_from_type, delivery_to_type, pickup_address_name,
+		delivery_address_name, shipment_parcel, description_of_content, pickup_date, value_of_goods, pickup_contact_name,
+		delivery_contact_name))
+
+	services_by_date = call_provider(PACKLINK_PROVIDER, 'get_services_by_date',
+		pickup_address=get_address(pickup_address_name),
+		delivery_address=get_address(delivery_address_name),
+		shipment_parcel=shipment_parcel,
+		from_date=pickup_date,
+		days=cint(days)
+	) or {}
+	return {date: store_quotes(match_parcel_service_type_carrier(services, ['carrier_name', 'carrier']), rates_key)
+		for date, services in services_by_date.items()}
+
+@frappe.whitelist()
+def auto_select_service(shipment):
+	# Return the quote of the service selected by the Shipping Service Rules for a submitted Shipment
+	doc = frappe.get_doc('Shipment', shipment)
+	doc.check_permission('read')
+	service, rule = select_shipment_service(doc)
+	if not service:
+		frappe.throw(_('No service matches the Shipping Service Rules for {0}').format(frappe.bold(shipment)),
+			title=_('No Service Selected'))
+
+	quote = store_quotes([service], get_shipping_rates_cache_key(get_shipment_rate_args(doc)))[0]
+	quote.rule = rule
+	return quote
+
+def select_shipment_service(doc, rules=None):
+	rate_args = get_shipment_rate_args(doc)
+	services = get_cached_shipping_rates(rate_args)
+	context = get_rule_context(get_address(doc.pickup_address_name), get_address(doc.delivery_address_name),
+		get_chargeable_weight(rate_args.shipment_parcel))
+	return select_service(services, context, rules)
+
+@frappe.whitelist()
+def enqueue_auto_booking(shipments):
+	# Book the given Shipments in the background with the services selected by the Shipping Service Rules
+	if isinstance(shipments, string_types):
+		shipments = json.loads(shipments)
+	for shipment in shipments:
+		frappe.has_permission('Shipment', 'write', shipment, throw=True)
+
+	frappe.enqueue('erpnext_shipping.erpnext_shipping.shipping.auto_book_shipments',
+		queue='long', timeout=3600, shipments=shipments)
+
+def auto_book_shipments(shipments):
+	rules = get_compiled_rules()
+	for shipment in shipments:
+		doc = frappe.get_doc('Shipment', shipment)
+		if doc.docstatus != 1 or doc.shipment_id:
+			continue
+
+		try:
+			auto_book_shipment(doc, rules)
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			show_error_alert('automatically booking Shipments')
+
+def auto_book_shipment(doc, rules=None):
+	# Returns None if no service matches the rules, raises if the provider failed to book the selected one
+	service, rule = select_shipment_service(doc, rules)
+	if not service:
+		return
+
+	rate_args = get_shipment_rate_args(doc)
+	shipment_info = book_service(service, shipment=doc.name,
+		delivery_notes=[d.delivery_note for d in doc.shipment_delivery_note], **rate_args)
+	if not shipment_info:
+		frappe.throw(_('{0} could not book {1} for Shipment {2}').format(service.get('service_provider'),
+			service.get('service_name') or service.get('carrier'), doc.name), title=_('Booking Failed'))
+	return shipment_info
+
+def call_provider(service_provider, method, **kwargs):
+	# Concurrent identical calls, from any worker, share a single provider request
+	return single_flight([service_provider, method], kwargs,
+		lambda: getattr(get_provider(service_provider), method)(**kwargs))
+
+def get_shipment_contacts(pickup_from_type, delivery_to_type, pickup_contact_name=None, delivery_contact_name=None):
+	# ERPNext's Shipment module is only imported when a company contact is needed
+	from erpnext.stock.doctype.shipment.shipment import get_company_contact
 
 	if pickup_from_type != 'Company':
 		pickup_contact = get_contact(pickup_contact_name)
@@ -94,93 +289,187 @@ def create_shipment(shipment, pickup_from_type, delivery_to_type, pickup_address
 		delivery_contact = get_contact(delivery_contact_name)
 	else:
 		delivery_contact = get_company_contact(user=pickup_contact_name)
+	return pickup_contact, delivery_contact
+
+@frappe.whitelist()
+def create_shipment(shipment, pickup_from_type, delivery_to_type, pickup_address_name,
+		delivery_address_name, shipment_parcel, description_of_content, pickup_date,
+		value_of_goods, quote_id, shipment_notific_email=None, tracking_notific_email=None,
+		pickup_contact_name=None, delivery_contact_name=None, delivery_notes=[]):
+	# Create Shipment for the selected provider.
+	# The service, including its price, is only ever read from the quotes kept on the server,
+	# and only for the Shipment details it was quoted for.
+	rates_key = get_shipping_rates_cache_key(get_rate_args(pickup_from_type, delivery_to_type, pickup_address_name,
+		delivery_address_name, shipment_parcel, description_of_content, pickup_date, value_of_goods, pickup_contact_name,
+		delivery_contact_name))
+	return book_service(get_quote(quote_id, rates_key), shipment, pickup_from_type, delivery_to_type, pickup_address_name,
+		delivery_address_name, shipment_parcel, description_of_content, pickup_date, value_of_goods,
+		pickup_contact_name, delivery_contact_name, delivery_notes)
 
-	if service_info['service_provider'] == LETMESHIP_PROVIDER:
-		letmeship = LetMeShipUtils()
-		shipment_info = letmeship.create_shipment(
-			pickup_address=pickup_address,
-			delivery_address=delivery_address,
-			shipment_parcel=shipment_parcel,
-			description_of_content=description_of_content,
-			pickup_date=pickup_date,
-			value_of_goods=value_of_goods,
-			pickup_contact=pickup_contact,
-			delivery_contact=delivery_contact,
-			service_info=service_info
-		)
-
-	if service_info['service_provider'] == PACKLINK_PROVIDER:
-		packlink = PackLinkUtils()
-		shipment_info = packlink.create_shipment(
-			pickup_address=pickup_address,
-			delivery_address=delivery_address,
-			shipment_parcel=shipment_parcel,
-			description_of_content=description_of_content,
-			pickup_date=pickup_date,
-			value_of_goods=value_of_goods,
-			pickup_contact=pickup_contact,
-			delivery_contact=delivery_contact,
-			service_info=service_info,
-		)
-
-	if service_info['service_provider'] == SENDCLOUD_PROVIDER:
-		sendcloud = SendCloudUtils()
-		shipment_info = sendcloud.create_shipment(
-			shipment=shipment,
-			delivery_address=delivery_address,
-			shipment_parcel=shipment_parcel,
-			description_of_content=description_of_content,
-			value_of_goods=value_of_goods,
-			delivery_contact=delivery_contact,
-			service_info=service_info,
-		)
-
-	if shipment_info:
-		fields = ['service_provider', 'carrier', 'carrier_service', 'shipment_id', 'shipment_amount', 'awb_number']
-		for field in fields:
-			frappe.db.set_value('Shipment', shipment, field, shipment_info.get(field))
-		frappe.db.set_value('Shipment', shipment, 'status', 'Booked')
+def book_service(service_info, shipment, pickup_from_type, delivery_to_type, pickup_address_name,
+		delivery_address_name, shipment_parcel, description_of_content, pickup_date, value_of_goods,
+		pickup_contact_name=None, delivery_contact_name=None, delivery_notes=None):
+	# Book the service, a full service dict as quoted by the providers, for the Shipment
+	with shipping_profile('create_shipment'):
+		if service_info.get('is_estimate'):
+			frappe.throw(_('The price of {0} is an estimate and cannot be booked. Please fetch the shipping rates again.')
+				.format(service_info.get('service_name') or service_info.get('carrier')), title=_('Estimated Rate'))
+		shipment_info = None
+		pickup_address = get_address(pickup_address_name)
+		delivery_address = get_address(delivery_address_name)
+		pickup_contact, delivery_contact = get_shipment_contacts(pickup_from_type, delivery_to_type,
+			pickup_contact_name, delivery_contact_name)
 
-		if delivery_notes:
-			update_delivery_note(delivery_notes=delivery_notes, shipment_info=shipment_info)
+		with profile_stage('Validation'):
+			validate_shipment_payload([service_info['service_provider']], shipment_parcel, pickup_address,
+				delivery_address, pickup_contact, delivery_contact)
 
-	return shipment_info
+		if service_info['service_provider'] == LETMESHIP_PROVIDER:
+			letmeship = get_provider(LETMESHIP_PROVIDER)
+			shipment_info = letmeship.create_shipment(
+				pickup_address=pickup_address,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel,
+				description_of_content=description_of_content,
+				pickup_date=pickup_date,
+				value_of_goods=value_of_goods,
+				pickup_contact=pickup_contact,
+				delivery_contact=delivery_contact,
+				service_info=service_info
+			)
+
+		if service_info['service_provider'] == PACKLINK_PROVIDER:
+			packlink = get_provider(PACKLINK_PROVIDER)
+			shipment_info = packlink.create_shipment(
+				pickup_address=pickup_address,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel,
+				description_of_content=description_of_content,
+				pickup_date=pickup_date,
+				value_of_goods=value_of_goods,
+				pickup_contact=pickup_contact,
+				delivery_contact=delivery_contact,
+				service_info=service_info,
+			)
+
+		if service_info['service_provider'] == SENDCLOUD_PROVIDER:
+			sendcloud = get_provider(SENDCLOUD_PROVIDER)
+			shipment_info = sendcloud.create_shipment(
+				shipment=shipment,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel,
+				description_of_content=description_of_content,
+				value_of_goods=value_of_goods,
+				delivery_contact=delivery_contact,
+				service_info=service_info,
+			)
+
+		if service_info['service_provider'] == RATE_CARD_PROVIDER:
+			rate_card = get_provider(RATE_CARD_PROVIDER)
+			shipment_info = rate_card.create_shipment(
+				shipment=shipment,
+				delivery_address=delivery_address,
+				shipment_parcel=shipment_parcel,
+				service_info=service_info,
+			)
+
+		if shipment_info:
+			fields = ['service_provider', 'carrier', 'carrier_service', 'shipment_id', 'shipment_amount', 'awb_number']
+			for field in fields:
+				frappe.db.set_value('Shipment', shipment, field, shipment_info.get(field))
+			frappe.db.set_value('Shipment', shipment, 'status', 'Booked')
+			if shipment_info.get('pickup_date'):
+				# the provider may collect on another day than the one on the Shipment
+				frappe.db.set_value('Shipment', shipment, 'pickup_date', shipment_info.get('pickup_date'))
+			update_parcel_tracking(shipment, get_parcels(shipment_info.get('shipment_id'), shipment_info))
+
+			if delivery_notes:
+				update_delivery_note(delivery_notes=delivery_notes, shipment_info=shipment_info)
+
+		return shipment_info
 
 @frappe.whitelist()
-def print_shipping_label(service_provider, shipment_id):
+def print_shipping_label(service_provider, shipment_id, shipment=None):
+	if shipment:
+		frappe.has_permission('Shipment', 'read', shipment, throw=True)
 	if service_provider == LETMESHIP_PROVIDER:
-		letmeship = LetMeShipUtils()
-		shipping_label = letmeship.get_label(shipment_id)
+		shipping_label = call_provider(LETMESHIP_PROVIDER, 'get_label', shipment_id=shipment_id)
 	elif service_provider == PACKLINK_PROVIDER:
-		packlink = PackLinkUtils()
-		shipping_label = packlink.get_label(shipment_id)
+		shipping_label = call_provider(PACKLINK_PROVIDER, 'get_label', shipment_id=shipment_id)
 	elif service_provider == SENDCLOUD_PROVIDER:
-		sendcloud = SendCloudUtils()
-		shipping_label = sendcloud.get_label(shipment_id)
+		parcel_ids = get_provider_parcel_ids(shipment) if shipment else None
+		shipping_label = call_provider(SENDCLOUD_PROVIDER, 'get_label', shipment_id=shipment_id, parcel_ids=parcel_ids)
+	elif service_provider == RATE_CARD_PROVIDER:
+		frappe.throw(_('Labels for Rate Card services are printed with the carrier directly'), title=_('Label Not Available'))
 	return shipping_label
 
 @frappe.whitelist()
 def update_tracking(shipment, service_provider, shipment_id, delivery_notes=[]):
 	# Update Tracking info in Shipment
-	tracking_data = None
+	with shipping_profile('update_tracking'):
+		try:
+			tracking_data = get_tracking_data(shipment, service_provider, shipment_id)
+		except ShippingProviderError:
+			# the provider failed, no tracking data yet is not a failure
+			enqueue_tracking_retry(shipment, service_provider, shipment_id, delivery_notes)
+			tracking_data = None
+
+		return set_tracking_data(shipment, service_provider, shipment_id, tracking_data, delivery_notes)
+
+def get_tracking_data(shipment, service_provider, shipment_id):
 	if service_provider == LETMESHIP_PROVIDER:
-		letmeship = LetMeShipUtils()
-		tracking_data = letmeship.get_tracking_data(shipment_id)
+		return call_provider(LETMESHIP_PROVIDER, 'get_tracking_data', shipment_id=shipment_id)
 	elif service_provider == PACKLINK_PROVIDER:
-		packlink = PackLinkUtils()
-		tracking_data = packlink.get_tracking_data(shipment_id)
+		return call_provider(PACKLINK_PROVIDER, 'get_tracking_data', shipment_id=shipment_id)
 	elif service_provider == SENDCLOUD_PROVIDER:
-		sendcloud = SendCloudUtils()
-		tracking_data = sendcloud.get_tracking_data(shipment_id)
+		return call_provider(SENDCLOUD_PROVIDER, 'get_tracking_data', shipment_id=shipment_id,
+			parcel_ids=get_provider_parcel_ids(shipment))
+
+def update_bulk_tracking(service_provider, shipments):
+	# Update Tracking info of many Shipments of one provider, fetched concurrently.
+	# `shipments` are dicts with name, shipment_id and delivery_notes.
+	if service_provider not in TRACKING_PROVIDERS or not shipments:
+		return
+
+	shipment_ids = [shipment.shipment_id for shipment in shipments]
+	parcel_ids = {shipment.shipment_id: get_provider_parcel_ids(shipment.name) for shipment in shipments}
+	bulk_tracking_data = call_provider(service_provider, 'get_bulk_tracking_data', shipment_ids=shipment_ids,
+		parcel_ids=parcel_ids)
+	for shipment in shipments:
+		# the provider utils leave out the Shipments whose request failed
+		if shipment.shipment_id not in bulk_tracking_data:
+			enqueue_tracking_retry(shipment.name, service_provider, shipment.shipment_id, shipment.delivery_notes)
+			continue
+		set_tracking_data(shipment.name, service_provider, shipment.shipment_id,
+			bulk_tracking_data[shipment.shipment_id], shipment.delivery_notes)
+
+def enqueue_tracking_retry(shipment, service_provider, shipment_id, delivery_notes=None):
+	if isinstance(delivery_notes, string_types):
+		delivery_notes = json.loads(delivery_notes)
+	enqueue_retry(UPDATE_TRACKING, service_provider, {
+		'shipment': shipment,
+		'service_provider': service_provider,
+		'shipment_id': shipment_id,
+		'delivery_notes': delivery_notes or [],
+	}, reference_doctype='Shipment', reference_name=shipment)
 
-	if tracking_data:
-		fields = ['awb_number', 'tracking_status', 'tracking_status_info', 'tracking_url']
-		for field in fields:
+def retry_update_tracking(shipment, service_provider, shipment_id, delivery_notes=None):
+	# Run by the Shipping Retry Job, a ShippingProviderError makes the job retry later
+	tracking_data = get_tracking_data(shipment, service_provider, shipment_id)
+	set_tracking_data(shipment, service_provider, shipment_id, tracking_data, delivery_notes)
+
+def set_tracking_data(shipment, service_provider, shipment_id, tracking_data, delivery_notes=None):
+	# Only write when the provider reports a change since the last known state
+	if tracking_data and record_tracking_event(shipment, service_provider, tracking_data):
+		for field in TRACKING_FIELDS:
 			frappe.db.set_value('Shipment', shipment, field, tracking_data.get(field))
+		update_parcel_tracking(shipment, get_parcels(shipment_id, tracking_data))
 
 		if delivery_notes:
 			update_delivery_note(delivery_notes=delivery_notes, tracking_info=tracking_data)
 
+	return tracking_data
+
 def update_delivery_note(delivery_notes, shipment_info=None, tracking_info=None):
 	# Update Shipment Info in Delivery Note
 	# Using db_set since some services might not exist
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""De-duplication of concurrent, identical provider calls across all workers.
+
+The first caller for a fingerprint takes a Redis lock and performs the call;
+callers arriving while it is in flight wait for its result instead of calling
+the provider again. If the first caller fails, the waiters call the provider
+themselves."""
+from __future__ import unicode_literals
+import time
+import redis
+import frappe
+from erpnext_shipping.erpnext_shipping.utils import get_fingerprint
+
+SINGLE_FLIGHT_KEY = 'shipping_single_flight'
+# longest a call may hold the lock, after that waiters stop waiting
+SINGLE_FLIGHT_TIMEOUT = 60
+# the shared result is kept just long enough for every waiter to pick it up
+SINGLE_FLIGHT_RESULT_EXPIRY = 10
+POLL_INTERVAL = 0.1
+
+
+def single_flight(namespace, args, fn, timeout=SINGLE_FLIGHT_TIMEOUT):
+	"""Returns `fn()`, called only once for concurrent callers with the same namespace and args."""
+	fingerprint = get_fingerprint([namespace, args])
+	lock_key = frappe.cache().make_key('{0}:lock:{1}'.format(SINGLE_FLIGHT_KEY, fingerprint))
+	result_key = '{0}:result:{1}'.format(SINGLE_FLIGHT_KEY, fingerprint)
+	token = frappe.generate_hash(length=10)
+
+	if not frappe.cache().set(lock_key, token, nx=True, ex=timeout):
+		shared = wait_for_result(lock_key, result_key, timeout)
+		if shared is not None:
+			return shared['result']
+		# the first caller failed or timed out
+		return fn()
+
+	try:
+		result = fn()
+		frappe.cache().set_value(result_key, {'result': result}, expires_in_sec=SINGLE_FLIGHT_RESULT_EXPIRY)
+		return result
+	finally:
+		if frappe.safe_decode(frappe.cache().get(lock_key) or '') == token:
+			frappe.cache().delete(lock_key)
+
+
+def wait_for_result(lock_key, result_key, timeout):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		shared = frappe.cache().get_value(result_key, expires=True)
+		if shared is not None:
+			return shared
+		# the lock key carries the site prefix, exists of the cache may add it again
+		if not redis.Redis.exists(frappe.cache(), lock_key):
+			# released, check once more for a result written just before
+			return frappe.cache().get_value(result_key, expires=True)
+		time.sleep(POLL_INTERVAL)
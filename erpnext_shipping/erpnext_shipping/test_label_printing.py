@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+from __future__ import unicode_literals
+
+import unittest
+from erpnext_shipping.erpnext_shipping.label_printing import compress_row, get_repeat_code
+
+class TestLabelPrinting(unittest.TestCase):
+	def test_repeat_code(self):
+		self.assertEqual(get_repeat_code(2), 'H')
+		self.assertEqual(get_repeat_code(19), 'Y')
+		self.assertEqual(get_repeat_code(20), 'g')
+		self.assertEqual(get_repeat_code(45), 'hK')
+		self.assertEqual(get_repeat_code(400), 'z')
+		self.assertEqual(get_repeat_code(421), 'zgG')
+
+	def test_compress_row(self):
+		self.assertEqual(compress_row('0000'), ',')
+		self.assertEqual(compress_row('FFFF000F0000'), 'JFI0F,')
+		self.assertEqual(compress_row('F0F0'), 'F0F,')
+		self.assertEqual(compress_row('A' * 40), 'hA')
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+"""Tracking updates spread over any number of workers, on any number of nodes.
+
+Due Shipments are split into chunks that are pushed to a Redis list. Workers claim
+a chunk under a random token: the token goes into a sorted set of leases scored by
+the lease expiry and the chunk into a hash by token. Workers renew and release only
+their own token, so a worker whose lease expired cannot touch the lease of the next
+owner. Chunks whose lease expired, because their worker crashed or stalled, are moved
+back to the list and claimed again. Every claim counts as an attempt of the chunk, a
+chunk that failed `MAX_CHUNK_ATTEMPTS` times is moved to a dead letter list."""
+from __future__ import unicode_literals
+import json
+import time
+import frappe
+from frappe.utils import cint
+
+PENDING_KEY = 'shipping_tracking_chunks'
+LEASES_KEY = 'shipping_tracking_leases'
+LEASE_CHUNKS_KEY = 'shipping_tracking_lease_chunks'
+DEAD_CHUNKS_KEY = 'shipping_tracking_dead_chunks'
+MAX_CHUNK_ATTEMPTS = 3
+# dead chunks kept for inspection
+MAX_DEAD_CHUNKS = 1000
+LEASE_SECONDS = 5 * 60
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_WORKERS = 4
+# Shipments updated between two lease renewals
+BATCH_SIZE = 20
+
+CLAIM_SCRIPT = """
+local chunk = redis.call('rpop', KEYS[1])
+if chunk then
+	redis.call('zadd', KEYS[2], ARGV[1], ARGV[2])
+	redis.call('hset', KEYS[3], ARGV[2], chunk)
+end
+return chunk
+"""
+
+RENEW_SCRIPT = """
+if redis.call('zscore', KEYS[2], ARGV[2]) then
+	redis.call('zadd', KEYS[2], ARGV[1], ARGV[2])
+	return 1
+end
+return 0
+"""
+
+UPDATE_SCRIPT = """
+if redis.call('zscore', KEYS[2], ARGV[1]) then
+	redis.call('hset', KEYS[3], ARGV[1], ARGV[2])
+	return 1
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+redis.call('hdel', KEYS[3], ARGV[1])
+return redis.call('zrem', KEYS[2], ARGV[1])
+"""
+
+REAP_SCRIPT = """
+local tokens = redis.call('zrangebyscore', KEYS[2], 0, ARGV[1])
+for _, token in ipairs(tokens) do
+	local chunk = redis.call('hget', KEYS[3], token)
+	if chunk then
+		redis.call('lpush', KEYS[1], chunk)
+	end
+	redis.call('zrem', KEYS[2], token)
+	redis.call('hdel', KEYS[3], token)
+end
+return #tokens
+"""
+
+
+def get_keys():
+	# Site specific keys for the raw Redis commands
+	cache = frappe.cache()
+	return cache.make_key(PENDING_KEY), cache.make_key(LEASES_KEY), cache.make_key(LEASE_CHUNKS_KEY)
+
+
+def queue_tracking_chunks(shipments_by_provider):
+	"""Push the Shipments in chunks and start the workers.
+
+	`shipments_by_provider` maps providers to dicts with name, shipment_id and delivery_notes."""
+	settings = frappe.get_cached_doc('Shipping Settings')
+	chunk_size = cint(settings.tracking_chunk_size) or DEFAULT_CHUNK_SIZE
+
+	chunks = 0
+	for service_provider, shipments in shipments_by_provider.items():
+		for i in range(0, len(shipments), chunk_size):
+			# lpush and llen of the cache prefix the key with the site themselves
+			frappe.cache().lpush(PENDING_KEY, json.dumps({
+				'id': frappe.generate_hash(length=10),
+				'service_provider': service_provider,
+				'shipments': shipments[i:i + chunk_size],
+			}))
+			chunks += 1
+
+	start_workers(min(chunks, cint(settings.tracking_workers) or DEFAULT_WORKERS))
+
+
+def start_workers(count):
+	for i in range(count):
+		frappe.enqueue('erpnext_shipping.erpnext_shipping.tracking_workers.work_tracking_chunks', queue='long')
+
+
+def work_tracking_chunks():
+	# Claim and process chunks until there are none left
+	from erpnext_shipping.erpnext_shipping.shipping import update_bulk_tracking
+
+	while True:
+		reap_expired_leases()
+		token = frappe.generate_hash(length=16)
+		chunk = claim_chunk(token)
+		if not chunk:
+			break
+
+		data = json.loads(chunk)
+		data['attempts'] = cint(data.get('attempts')) + 1
+		try:
+			if data['attempts'] > MAX_CHUNK_ATTEMPTS:
+				bury_chunk(data)
+				continue
+			# a chunk reaped from a crashed worker keeps the attempt
+			update_lease_chunk(token, data)
+
+			shipments = [frappe._dict(shipment) for shipment in data['shipments']]
+			done = 0
+			try:
+				for i in range(0, len(shipments), BATCH_SIZE):
+					if not renew_lease(token):
+						# the lease expired and the chunk was handed to another worker
+						break
+					update_bulk_tracking(data['service_provider'], shipments[i:i + BATCH_SIZE])
+					frappe.db.commit()
+					done = i + BATCH_SIZE
+			except Exception:
+				frappe.db.rollback()
+				frappe.log_error(frappe.get_traceback(), 'Tracking chunk {0} failed'.format(data.get('id')))
+				# the updated batches are committed, only the rest is tried again
+				data['shipments'] = data['shipments'][done:]
+				if data['attempts'] >= MAX_CHUNK_ATTEMPTS:
+					bury_chunk(data)
+				else:
+					frappe.cache().lpush(PENDING_KEY, json.dumps(data))
+				frappe.db.commit()
+		finally:
+			release_chunk(token)
+
+
+def claim_chunk(token):
+	chunk = frappe.cache().eval(CLAIM_SCRIPT, 3, *(get_keys() + (time.time() + LEASE_SECONDS, token)))
+	return frappe.safe_decode(chunk) if chunk else None
+
+
+def renew_lease(token):
+	return bool(frappe.cache().eval(RENEW_SCRIPT, 3, *(get_keys() + (time.time() + LEASE_SECONDS, token))))
+
+
+def update_lease_chunk(token, data):
+	return frappe.cache().eval(UPDATE_SCRIPT, 3, *(get_keys() + (token, json.dumps(data))))
+
+
+def bury_chunk(data):
+	# Keep the chunks that failed too often out of the queue, the newest ones first
+	frappe.cache().lpush(DEAD_CHUNKS_KEY, json.dumps(data))
+	frappe.cache().ltrim(DEAD_CHUNKS_KEY, 0, MAX_DEAD_CHUNKS - 1)
+
+
+def release_chunk(token):
+	frappe.cache().eval(RELEASE_SCRIPT, 3, *(get_keys() + (token,)))
+
+
+def reap_expired_leases():
+	# Move the chunks of crashed workers back to the pending list
+	return frappe.cache().eval(REAP_SCRIPT, 3, *(get_keys() + (time.time(),)))
+
+
+def restart_stalled_chunks():
+	# Scheduled: pick up chunks whose workers all crashed
+	reap_expired_leases()
+	if frappe.cache().llen(PENDING_KEY):
+		start_workers(1)
@@ -2,16 +2,52 @@
 # Copyright (c) 2020, Frappe Technologies and contributors
 # For license information, please see license.txt
 from __future__ import unicode_literals
+import re
+import json
+import hashlib
 import frappe
 from frappe import _
+from erpnext_shipping.erpnext_shipping.postal_codes import validate_postal_code
+
+TRACKING_URL_CACHE_KEY = 'parcel_service_url_reference'
+TRACKING_NUMBER_PLACEHOLDER = re.compile(r'{{\s*tracking_number\s*}}')
+JINJA_MARKUP = re.compile(r'{{|{%|{#')
+
+# compiled url templates keyed by the url_reference itself, so an edited
+# reference simply compiles into a new entry and never needs invalidation
+compiled_tracking_urls = {}
 
 def get_tracking_url(carrier, tracking_number):
 	# Return the formatted Tracking URL.
-	tracking_url = ''
-	url_reference = frappe.get_value('Parcel Service', carrier, 'url_reference')
-	if url_reference:
-		tracking_url = frappe.render_template(url_reference, {'tracking_number': tracking_number})
-	return tracking_url
+	url_reference = frappe.cache().hget(TRACKING_URL_CACHE_KEY, carrier,
+		generator=lambda: frappe.get_value('Parcel Service', carrier, 'url_reference') or '')
+	if not url_reference:
+		return ''
+	return get_compiled_tracking_url(url_reference)(tracking_number)
+
+
+def get_compiled_tracking_url(url_reference):
+	# Return a callable rendering the url reference for a tracking number.
+	# References using only the `tracking_number` placeholder are split once
+	# into literal parts and joined, anything else is compiled with Jinja.
+	if url_reference not in compiled_tracking_urls:
+		parts = TRACKING_NUMBER_PLACEHOLDER.split(url_reference)
+		if not any(JINJA_MARKUP.search(part) for part in parts):
+			compiled = lambda tracking_number: str(tracking_number).join(parts)
+		else:
+			template = frappe.get_jenv().from_string(url_reference)
+			compiled = lambda tracking_number: template.render({'tracking_number': tracking_number})
+		compiled_tracking_urls[url_reference] = compiled
+	return compiled_tracking_urls[url_reference]
+
+
+def clear_tracking_url_cache(carrier):
+	frappe.cache().hdel(TRACKING_URL_CACHE_KEY, carrier)
+
+
+def get_fingerprint(data):
+	# Return a stable hash of JSON serializable data, e.g. the arguments of a request
+	return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
 
 
 def get_address(address_name):
@@ -32,7 +68,7 @@ def get_address(address_name):
 
 	address.country = address.country.strip()
 	address.country_code = get_country_code(address.country)
-	address.pincode = address.pincode.replace(' ', '')
+	validate_postal_code(address.country_code, address.pincode)
 	address.city = address.city.strip()
 
 	return address
@@ -59,12 +95,11 @@ def get_contact(contact_name):
 	fields = ['first_name', 'last_name', 'email_id', 'phone', 'mobile_no', 'gender']
 	contact = frappe.db.get_value('Contact', contact_name, fields, as_dict=1)
 
-	if not contact.last_name:
-		frappe.throw(_("Last Name is mandatory to continue. </br> \
-				Please set Last Name for Contact <a href='#Form/Contact/{0}'>{1}</a>"
-			).format(contact_name, contact_name))
+	# mandatory fields and their formats are checked in `validate_shipment_payload`
+	# per provider, so that all problems are reported at once
 	if not contact.phone:
 		contact.phone = contact.mobile_no
+	contact.email = contact.email_id
 	return contact
 
 def match_parcel_service_type_carrier(shipment_prices, reference):
@@ -77,26 +112,44 @@ def match_parcel_service_type_carrier(shipment_prices, reference):
 		shipment_prices[idx].is_preferred = is_preferred
 	return shipment_prices
 
-def show_error_alert(action):
-	log = frappe.log_error(frappe.get_traceback())
-	link_to_log = frappe.utils.get_link_to_form("Error Log", log.name, "See what happened.")
-	frappe.msgprint(_('An Error occurred while {0}. {1}').format(action, link_to_log), indicator='orange', alert=True)
+def show_error_alert(action, service_provider=None):
+	# Repeated failures are aggregated in one Shipping Error Summary, only a sample keeps its traceback
+	from erpnext_shipping.erpnext_shipping.doctype.shipping_error_summary.shipping_error_summary import capture_error
+
+	error_summary = capture_error(action, service_provider)
+	# the summary of a new error is only created by the next flush of the error counts
+	link_to_log = frappe.utils.get_link_to_form("Shipping Error Summary", error_summary, "See what happened.") \
+		if frappe.db.exists("Shipping Error Summary", error_summary) else ''
+	frappe.msgprint(_('An Error occurred while {0}. {1}').format(action, link_to_log).strip(), indicator='orange', alert=True)
 
 def update_tracking_info_daily():
 	# Daily scheduled event to update Tracking info for not delivered Shipments
 	# Also Updates the related Delivery Notes
+	from erpnext_shipping.erpnext_shipping.tracking_workers import queue_tracking_chunks
+
 	shipments = frappe.get_all('Shipment', filters={
 		'docstatus': 1,
 		'status': 'Booked',
 		'shipment_id': ['!=', ''],
 		'tracking_status': ['!=', 'Delivered'],
-	})
+	}, fields=['name', 'service_provider', 'shipment_id'])
+
+	shipments_by_provider = {}
 	for shipment in shipments:
-		shipment_doc = frappe.get_doc('Shipment', shipment.name)
-		tracking_info = update_tracking(shipment_doc.service_provider, shipment_doc.shipment_id,
-				shipment_doc.shipment_delivery_notes)
-
-		if tracking_info:
-			fields = ['awb_number', 'tracking_status', 'tracking_status_info', 'tracking_url']
-			for field in fields:
-				shipment_doc.db_set(field, tracking_info.get(field))
+		shipment.delivery_notes = [d.delivery_note for d in frappe.get_all('Shipment Delivery Note',
+			filters={'parent': shipment.name}, fields=['delivery_note'])]
+		shipments_by_provider.setdefault(shipment.service_provider, []).append(shipment)
+
+	# SendCloud Shipments are kept up to date by the hourly delta sync, if enabled.
+	# It matches parcels by their Shipment Parcel Tracking rows, Shipments booked before
+	# those rows existed are polled until the first update adds them.
+	if frappe.db.get_single_value('SendCloud', 'enable_delta_sync') and shipments_by_provider.get('SendCloud'):
+		tracked = {d.parent for d in frappe.get_all('Shipment Parcel Tracking', filters={
+			'parenttype': 'Shipment',
+			'parent': ('in', [shipment.name for shipment in shipments_by_provider['SendCloud']]),
+		}, fields=['parent'])}
+		shipments_by_provider['SendCloud'] = [shipment for shipment in shipments_by_provider['SendCloud']
+			if shipment.name not in tracked]
+
+	# chunks are worked off by as many workers as configured, on any node
+	queue_tracking_chunks(shipments_by_provider)
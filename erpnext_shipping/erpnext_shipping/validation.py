@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies and contributors
+# For license information, please see license.txt
+from __future__ import unicode_literals
+import re
+import json
+import frappe
+from six import string_types
+from frappe import _
+from frappe.utils import flt, cint, validate_email_address
+
+# Field constraints per provider, checked before any request is sent.
+# A length of 0 only makes the field mandatory.
+PROVIDER_RULES = {
+	'LetMeShip': {
+		'address': {'address_line1': 35, 'city': 35, 'pincode': 10},
+		'contact': {'first_name': 35, 'last_name': 35, 'email': 0, 'phone': 0},
+		'international_phone': True,
+	},
+	'Packlink': {
+		'address': {'address_line1': 100, 'city': 50, 'pincode': 10},
+		'contact': {'first_name': 0, 'last_name': 0, 'email': 0, 'phone': 0},
+	},
+	'SendCloud': {
+		'address': {'address_title': 50, 'address_line1': 75, 'address_line2': 75, 'city': 30, 'pincode': 12},
+		'contact': {'first_name': 0, 'last_name': 0, 'email': 0, 'phone': 20},
+	},
+}
+OPTIONAL_FIELDS = ('address_line2',)
+ADDRESS_LABELS = {
+	'address_title': 'Address Title',
+	'address_line1': 'Address Line 1',
+	'address_line2': 'Address Line 2',
+	'city': 'City',
+	'pincode': 'Postal Code',
+}
+CONTACT_LABELS = {
+	'first_name': 'First Name',
+	'last_name': 'Last Name',
+	'email': 'Email',
+	'phone': 'Phone',
+}
+INTERNATIONAL_PHONE = re.compile(r'^(\+|00)[1-9]')
+
+
+class PayloadValidator():
+	"""Collects every problem of a shipment payload, so they can be reported at once."""
+	def __init__(self):
+		self.errors = []
+
+	def add_error(self, message):
+		if message not in self.errors:
+			self.errors.append(message)
+
+	def validate_fields(self, doc, rules, labels, context):
+		for field, max_length in rules.items():
+			value = (doc.get(field) or '').strip()
+			if not value and field not in OPTIONAL_FIELDS:
+				self.add_error(_('{0} is missing in {1}').format(_(labels[field]), context))
+			elif max_length and len(value) > max_length:
+				self.add_error(_('{0} of {1} must not be longer than {2} characters')
+					.format(_(labels[field]), context, max_length))
+
+	def validate_address(self, rules, address, context):
+		if address:
+			self.validate_fields(address, rules.get('address', {}), ADDRESS_LABELS, context)
+
+	def validate_contact(self, rules, contact, context):
+		if not contact:
+			return
+
+		self.validate_fields(contact, rules.get('contact', {}), CONTACT_LABELS, context)
+		if contact.get('email') and not validate_email_address(contact.email):
+			self.add_error(_('{0} is not a valid email address for {1}').format(frappe.bold(contact.email), context))
+		if rules.get('international_phone') and contact.get('phone') \
+			and not INTERNATIONAL_PHONE.match(contact.phone.strip()):
+			self.add_error(_('Phone of {0} must start with the country calling code, e.g. +49').format(context))
+
+	def validate_parcels(self, shipment_parcel):
+		if isinstance(shipment_parcel, string_types):
+			shipment_parcel = json.loads(shipment_parcel)
+
+		if not shipment_parcel:
+			self.add_error(_('Please add at least one Parcel'))
+		for idx, parcel in enumerate(shipment_parcel, start=1):
+			for field in ('length', 'width', 'height', 'weight'):
+				if flt(parcel.get(field)) <= 0:
+					self.add_error(_('Parcel {0}: {1} must be greater than 0').format(idx, _(field.title())))
+			if cint(parcel.get('count')) < 1:
+				self.add_error(_('Parcel {0}: Count must be at least 1').format(idx))
+
+	def throw(self):
+		if self.errors:
+			frappe.throw(self.errors, title=_('Please fix the following to continue'), as_list=True)
+
+
+def validate_shipment_payload(service_providers, shipment_parcel, pickup_address=None, delivery_address=None,
+	pickup_contact=None, delivery_contact=None):
+	# Check the shipment against the constraints of every given provider and report all problems together
+	validator = PayloadValidator()
+	validator.validate_parcels(shipment_parcel)
+	for service_provider in service_providers:
+		rules = PROVIDER_RULES.get(service_provider, {})
+		validator.validate_address(rules, pickup_address, _('Pickup Address'))
+		validator.validate_address(rules, delivery_address, _('Delivery Address'))
+		validator.validate_contact(rules, pickup_contact, _('Pickup Contact'))
+		validator.validate_contact(rules, delivery_contact, _('Delivery Contact'))
+	validator.throw()
@@ -36,6 +36,9 @@ app_license = "MIT"
 doctype_js = {
 	"Shipment" : "public/js/shipment.js"
 }
+doctype_list_js = {
+	"Shipment" : "public/js/shipment_list.js"
+}
 # doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
@@ -93,20 +96,62 @@ after_install = "erpnext_shipping.install.after_install"
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-#	}
-# }
+doc_events = {
+	"Shipment": {
+		"on_submit": "erpnext_shipping.erpnext_shipping.shipping.prefetch_shipping_rates"
+	},
+	"Delivery Note": {
+		"on_submit": "erpnext_shipping.erpnext_shipping.shipment_pipeline.start_shipment_pipeline"
+	}
+}
+
+# Shipping Providers
+# ------------------
+# Utils classes are imported lazily, only once a provider is enabled and used
+
+shipping_providers = {
+	"LetMeShip": {
+		"settings": "LetMeShip",
+		"utils": "erpnext_shipping.erpnext_shipping.doctype.letmeship.letmeship.LetMeShipUtils"
+	},
+	"Packlink": {
+		"settings": "Packlink",
+		"utils": "erpnext_shipping.erpnext_shipping.doctype.packlink.packlink.PackLinkUtils"
+	},
+	"SendCloud": {
+		"settings": "SendCloud",
+		"utils": "erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud.SendCloudUtils"
+	},
+	"Rate Card": {
+		"is_enabled": "erpnext_shipping.erpnext_shipping.doctype.shipping_rate_card.shipping_rate_card.is_rate_card_enabled",
+		"utils": "erpnext_shipping.erpnext_shipping.doctype.shipping_rate_card.shipping_rate_card.RateCardUtils"
+	}
+}
 
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"erpnext_shipping.erpnext_shipping.doctype.shipping_retry_job.shipping_retry_job.process_retry_jobs",
+			"erpnext_shipping.erpnext_shipping.shipment_pipeline.start_deferred_pipelines"
+		],
+		"*/5 * * * *": [
+			"erpnext_shipping.erpnext_shipping.quote_log.flush_quote_log",
+			"erpnext_shipping.erpnext_shipping.tracking_workers.restart_stalled_chunks",
+			"erpnext_shipping.erpnext_shipping.doctype.shipping_error_summary.shipping_error_summary.flush_error_counts",
+			"erpnext_shipping.erpnext_shipping.profiler.flush_profile_logs"
+		]
+	},
+	"hourly": [
+		"erpnext_shipping.erpnext_shipping.doctype.sendcloud.sendcloud.sync_parcel_statuses"
+	],
 	"daily": [
-		"erpnext_shipping.erpnext_shipping.utils.update_tracking_info_daily"
+		"erpnext_shipping.erpnext_shipping.utils.update_tracking_info_daily",
+		"erpnext_shipping.erpnext_shipping.quote_log.compact_quote_log",
+		"erpnext_shipping.erpnext_shipping.rate_estimation.build_rate_estimates",
+		"erpnext_shipping.erpnext_shipping.doctype.shipping_retry_job.shipping_retry_job.clear_completed_retry_jobs"
 	]
 }
 
@@ -203,5 +248,42 @@ shipping_custom_fields = {
 			"translatable": 0,
 			"insert_after": "tracking_status"
 		}
+	],
+	"Item": [
+		{
+			"fieldname": "shipping_dimensions_section",
+			"label": "Shipping Dimensions",
+			"fieldtype": "Section Break",
+			"collapsible": 1,
+			"insert_after": "weight_uom"
+		},
+		{
+			"fieldname": "shipping_length",
+			"label": "Length (cm)",
+			"fieldtype": "Float",
+			"insert_after": "shipping_dimensions_section"
+		},
+		{
+			"fieldname": "shipping_width",
+			"label": "Width (cm)",
+			"fieldtype": "Float",
+			"insert_after": "shipping_length"
+		},
+		{
+			"fieldname": "shipping_height",
+			"label": "Height (cm)",
+			"fieldtype": "Float",
+			"insert_after": "shipping_width"
+		}
+	],
+	"Shipment": [
+		{
+			"fieldname": "shipment_parcel_tracking",
+			"label": "Parcel Tracking",
+			"fieldtype": "Table",
+			"options": "Shipment Parcel Tracking",
+			"read_only": 1,
+			"insert_after": "tracking_status_info"
+		}
 	]
 }
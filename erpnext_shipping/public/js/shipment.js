@@ -3,22 +3,40 @@
 
 frappe.ui.form.on('Shipment', {
 	refresh: function(frm) {
+		if (frm.doc.docstatus === 0 && (frm.doc.shipment_delivery_note || []).length) {
+			frm.add_custom_button(__('Propose Parcels'), function() {
+				return frm.events.propose_parcels(frm);
+			}, __('Tools'));
+		}
 		if (frm.doc.docstatus === 1 && !frm.doc.shipment_id) {
 			frm.add_custom_button(__('Fetch Shipping Rates'), function() {
 				return frm.events.fetch_shipping_rates(frm);
 			});
+			frm.add_custom_button(__('Auto Select Service'), function() {
+				return frm.events.auto_select_service(frm);
+			}, __('Tools'));
 		}
 		if (frm.doc.shipment_id) {
 			frm.add_custom_button(__('Print Shipping Label'), function() {
 				return frm.events.print_shipping_label(frm);
 			}, __('Tools'));
+			if (frm.doc.service_provider != "Rate Card") {
+				frm.add_custom_button(__('Print ZPL Label'), function() {
+					return frm.events.print_zpl_label(frm);
+				}, __('Tools'));
+			}
 			if (frm.doc.tracking_status != 'Delivered') {
 				frm.add_custom_button(__('Update Tracking'), function() {
 					return frm.events.update_tracking(frm, frm.doc.service_provider, frm.doc.shipment_id);
 				}, __('Tools'));
 
 				frm.add_custom_button(__('Track Status'), function() {
-					if (frm.doc.tracking_url) {
+					const parcel_urls = (frm.doc.shipment_parcel_tracking || [])
+						.map(d => d.tracking_url)
+						.filter(url => url);
+					if (parcel_urls.length) {
+						parcel_urls.forEach(url => window.open(url));
+					} else if (frm.doc.tracking_url) {
 						const urls = frm.doc.tracking_url.split(', ');
 						urls.forEach(url => window.open(url));
 					} else {
@@ -63,6 +81,100 @@ frappe.ui.form.on('Shipment', {
 		}
 	},
 
+	auto_select_service: function(frm) {
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.shipping.auto_select_service",
+			freeze: true,
+			freeze_message: __("Selecting Service"),
+			args: {
+				shipment: frm.doc.name
+			},
+			callback: function(r) {
+				if (r.message) {
+					const quote = r.message;
+					frappe.confirm(
+						__("Rule {0} selected {1} {2} for {3}. Create the Shipment?", [
+							quote.rule.bold(), quote.carrier, quote.service_name || '',
+							format_currency(quote.total_price, "EUR", 2)
+						]),
+						() => frm.events.create_shipment(frm, quote.quote_id)
+					);
+				}
+			}
+		});
+	},
+
+	create_shipment: function(frm, quote_id) {
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.shipping.create_shipment",
+			freeze: true,
+			freeze_message: __("Creating Shipment"),
+			args: {
+				shipment: frm.doc.name,
+				pickup_from_type: frm.doc.pickup_from_type,
+				delivery_to_type: frm.doc.delivery_to_type,
+				pickup_address_name: frm.doc.pickup_address_name,
+				delivery_address_name: frm.doc.delivery_address_name,
+				shipment_parcel: frm.doc.shipment_parcel,
+				description_of_content: frm.doc.description_of_content,
+				pickup_date: frm.doc.pickup_date,
+				pickup_contact_name: frm.doc.pickup_from_type === 'Company' ? frm.doc.pickup_contact_person : frm.doc.pickup_contact_name,
+				delivery_contact_name: frm.doc.delivery_contact_name,
+				value_of_goods: frm.doc.value_of_goods,
+				quote_id: quote_id,
+				delivery_notes: (frm.doc.shipment_delivery_note || []).map(d => d.delivery_note)
+			},
+			callback: function(r) {
+				if (!r.exc) {
+					frm.reload_doc();
+					frappe.msgprint({
+						message: __("Shipment {1} has been created with {0}.", [r.message.service_provider, r.message.shipment_id.bold()]),
+						title: __("Shipment Created"),
+						indicator: "green"
+					});
+					frm.events.update_tracking(frm, r.message.service_provider, r.message.shipment_id);
+				}
+			}
+		});
+	},
+
+	propose_parcels: function(frm) {
+		frappe.prompt([
+			{
+				fieldname: 'parcel_service',
+				fieldtype: 'Link',
+				options: 'Parcel Service',
+				label: __('Parcel Service'),
+				default: frm.doc.carrier,
+				description: __('Its volumetric divisor sizes the parcels, leave empty to use the one of the Delivery Notes')
+			}
+		], (values) => {
+			frappe.call({
+				method: "erpnext_shipping.erpnext_shipping.cartonization.get_proposed_parcels",
+				freeze: true,
+				freeze_message: __("Packing Items"),
+				args: {
+					delivery_notes: (frm.doc.shipment_delivery_note || []).map(d => d.delivery_note),
+					parcel_service: values.parcel_service
+				},
+				callback: function(r) {
+					if (r.message) {
+						frm.clear_table('shipment_parcel');
+						r.message.forEach((parcel) => {
+							let row = frm.add_child('shipment_parcel');
+							row.length = parcel.length;
+							row.width = parcel.width;
+							row.height = parcel.height;
+							row.weight = parcel.weight;
+							row.count = parcel.count;
+						});
+						frm.refresh_field('shipment_parcel');
+					}
+				}
+			});
+		}, __('Propose Parcels'), __('Propose'));
+	},
+
 	print_shipping_label: function(frm) {
 		frappe.call({
 			method: "erpnext_shipping.erpnext_shipping.shipping.print_shipping_label",
@@ -70,7 +182,8 @@ frappe.ui.form.on('Shipment', {
 			freeze_message: __("Printing Shipping Label"),
 			args: {
 				shipment_id: frm.doc.shipment_id,
-				service_provider: frm.doc.service_provider
+				service_provider: frm.doc.service_provider,
+				shipment: frm.doc.name
 			},
 			callback: function(r) {
 				if (r.message) {
@@ -94,6 +207,35 @@ frappe.ui.form.on('Shipment', {
 		});
 	},
 
+	print_zpl_label: function(frm) {
+		frappe.call({
+			method: "erpnext_shipping.erpnext_shipping.label_printing.print_zpl_label",
+			freeze: true,
+			freeze_message: __("Printing ZPL Label"),
+			args: {
+				shipment_id: frm.doc.shipment_id,
+				service_provider: frm.doc.service_provider,
+				shipment: frm.doc.name
+			},
+			callback: function(r) {
+				if (!r.message) return;
+				if (r.message.zpl) {
+					// no printer configured, download the labels
+					const file = new Blob([r.message.zpl], {type: "application/zpl"});
+					const link = document.createElement("a");
+					link.href = URL.createObjectURL(file);
+					link.download = frm.doc.name + ".zpl";
+					link.click();
+				} else {
+					frappe.show_alert({
+						message: __("{0} label(s) sent to the printer", [r.message.printed]),
+						indicator: "green"
+					});
+				}
+			}
+		});
+	},
+
 	update_tracking: function(frm, service_provider, shipment_id) {
 		let delivery_notes = [];
 		(frm.doc.shipment_delivery_note || []).forEach((d) => {
@@ -121,14 +263,8 @@ frappe.ui.form.on('Shipment', {
 function select_from_available_services(frm, available_services) {
 	var headers = [ __("Service Provider"), __("Parcel Service"), __("Parcel Service Type"), __("Price"), "" ];
 
-	const arranged_services = available_services.reduce((prev, curr) => {
-		if (curr.is_preferred) {
-			prev.preferred_services.push(curr);
-		} else {
-			prev.other_services.push(curr);
-		}
-		return prev;
-	}, { preferred_services: [], other_services: [] });
+	let arranged_services = arrange_services(available_services);
+	const has_packlink = available_services.some(d => d.service_provider === 'Packlink');
 
 	frm.render_available_services = function(dialog, headers, arranged_services){
 		frappe.require("assets/js/shipment.min.js", function() {
@@ -143,6 +279,15 @@ function select_from_available_services(frm, available_services) {
 	const dialog = new frappe.ui.Dialog({
 		title: __("Select Service to Create Shipment"),
 		fields: [
+			{
+				fieldtype: 'Date',
+				fieldname: 'pickup_date',
+				label: __('Pickup Date'),
+				default: frm.doc.pickup_date,
+				hidden: !has_packlink,
+				description: __('Switches the Packlink services, the other services are quoted for the pickup date of the Shipment'),
+				onchange: () => frm.switch_pickup_date(dialog.get_value('pickup_date'))
+			},
 			{
 				fieldtype:'HTML',
 				fieldname:"available_services",
@@ -151,13 +296,38 @@ function select_from_available_services(frm, available_services) {
 		]
 	});
 
-	let delivery_notes = [];
-	(frm.doc.shipment_delivery_note || []).forEach((d) => {
-		delivery_notes.push(d.delivery_note);
-	});
-
 	frm.render_available_services(dialog, headers, arranged_services);
 
+	if (has_packlink) {
+		// Packlink returns the services for all pickup dates at once, so switching dates needs no new quote
+		frappe.xcall('erpnext_shipping.erpnext_shipping.shipping.fetch_packlink_rates_by_date', {
+			pickup_address_name: frm.doc.pickup_address_name,
+			delivery_address_name: frm.doc.delivery_address_name,
+			shipment_parcel: frm.doc.shipment_parcel,
+			pickup_date: frm.doc.pickup_date,
+			pickup_from_type: frm.doc.pickup_from_type,
+			delivery_to_type: frm.doc.delivery_to_type,
+			description_of_content: frm.doc.description_of_content,
+			value_of_goods: frm.doc.value_of_goods,
+			pickup_contact_name: frm.doc.pickup_from_type === 'Company' ? frm.doc.pickup_contact_person : frm.doc.pickup_contact_name,
+			delivery_contact_name: frm.doc.delivery_contact_name
+		}).then((services_by_date) => {
+			frm.packlink_services_by_date = services_by_date || {};
+		});
+	}
+
+	frm.switch_pickup_date = function(pickup_date) {
+		if (!frm.packlink_services_by_date || !pickup_date) {
+			return;
+		}
+		const services = available_services
+			.filter(d => d.service_provider !== 'Packlink')
+			.concat(frm.packlink_services_by_date[pickup_date] || [])
+			.sort((a, b) => a.total_price - b.total_price);
+		arranged_services = arrange_services(services);
+		frm.render_available_services(dialog, headers, arranged_services);
+	};
+
 	dialog.$body.on('click', '.btn', function() {
 		let service_type = $(this).attr("data-type");
 		let service_index = cint($(this).attr("id").split("-")[2]);
@@ -166,38 +336,19 @@ function select_from_available_services(frm, available_services) {
 	});
 
 	frm.select_row = function(service_data){
-		frappe.call({
-			method: "erpnext_shipping.erpnext_shipping.shipping.create_shipment",
-			freeze: true,
-			freeze_message: __("Creating Shipment"),
-			args: {
-				shipment: frm.doc.name,
-				pickup_from_type: frm.doc.pickup_from_type,
-				delivery_to_type: frm.doc.delivery_to_type,
-				pickup_address_name: frm.doc.pickup_address_name,
-				delivery_address_name: frm.doc.delivery_address_name,
-				shipment_parcel: frm.doc.shipment_parcel,
-				description_of_content: frm.doc.description_of_content,
-				pickup_date: frm.doc.pickup_date,
-				pickup_contact_name: frm.doc.pickup_from_type === 'Company' ? frm.doc.pickup_contact_person : frm.doc.pickup_contact_name,
-				delivery_contact_name: frm.doc.delivery_contact_name,
-				value_of_goods: frm.doc.value_of_goods,
-				service_data: service_data,
-				delivery_notes: delivery_notes
-			},
-			callback: function(r) {
-				if (!r.exc) {
-					frm.reload_doc();
-					frappe.msgprint({
-							message: __("Shipment {1} has been created with {0}.", [r.message.service_provider, r.message.shipment_id.bold()]),
-							title: __("Shipment Created"),
-							indicator: "green"
-						});
-					frm.events.update_tracking(frm, r.message.service_provider, r.message.shipment_id);
-				}
-			}
-		});
+		frm.events.create_shipment(frm, service_data.quote_id);
 		dialog.hide();
 	};
 	dialog.show();
+}
+
+function arrange_services(available_services) {
+	return available_services.reduce((prev, curr) => {
+		if (curr.is_preferred) {
+			prev.preferred_services.push(curr);
+		} else {
+			prev.other_services.push(curr);
+		}
+		return prev;
+	}, { preferred_services: [], other_services: [] });
 }
\ No newline at end of file
@@ -0,0 +1,17 @@
+frappe.listview_settings['Shipment'] = frappe.listview_settings['Shipment'] || {};
+
+$.extend(frappe.listview_settings['Shipment'], {
+	onload: function(listview) {
+		listview.page.add_actions_menu_item(__('Book with Service Rules'), function() {
+			const shipments = listview.get_checked_items(true);
+			frappe.xcall('erpnext_shipping.erpnext_shipping.shipping.enqueue_auto_booking', {
+				shipments: shipments
+			}).then(() => {
+				frappe.show_alert({
+					message: __('Booking {0} Shipments in the background', [shipments.length]),
+					indicator: 'green'
+				});
+			});
+		});
+	}
+});